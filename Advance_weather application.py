@@ -1,20 +1,425 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import requests
-import json
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from datetime import datetime
+import matplotlib.dates as mdates
+from PIL import Image, ImageTk
 import numpy as np
 import threading
 import time
-from PIL import Image, ImageTk
+import os
+import argparse
+import traceback
+import logging
 import io
 import base64
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from weather_core import (
+    PROVIDERS, AssetCache, BatchWeatherFetcher, MemoryWatchdog, RefreshScheduler, ResponseCache, WeatherClient,
+    WeatherHistoryStore, describe_status, load_city_list, local_utc_offsets, metrics, parse_current_weather, select_daily,
+    summarize_daily_forecast
+)
+from weather_analytics import derive_metrics, dew_point, stack_forecasts, trend_slope
+from weather_charts import (
+    ComfortChart, HistoryChart, HumidityChart, LiveDataChart, TemperatureChart, TrendChart, WindRoseChart, create_figure
+)
+
+DEFAULT_ASSET_DIR = os.path.join(os.path.expanduser('~'), '.weather_assets')
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser('~'), '.weather_history.sqlite3')
+
+
+class RingBuffer:
+    """Fixed-size NumPy ring buffer exposing the newest values as one contiguous view"""
+
+    def __init__(self, capacity, dtype=float):
+        self.capacity = capacity
+        # Every value is written twice so the window never wraps and needs no copy
+        self._data = np.zeros(capacity * 2, dtype=dtype)
+        self._index = 0
+        self.size = 0
+
+    def append(self, value):
+        self._data[self._index] = value
+        self._data[self._index + self.capacity] = value
+        self._index = (self._index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def view(self):
+        """Oldest-to-newest values, without copying"""
+        end = self._index + self.capacity
+        return self._data[end - self.size:end]
+
+    def clear(self):
+        self._index = 0
+        self.size = 0
+
+
+class ChartRenderer:
+    """Background thread that owns the chart figures and renders them to RGBA images with Agg
+
+    Artist updates are queued as callables and applied on the render thread, so the
+    Tk thread never touches a figure; finished frames are handed back via root.after.
+    Each chart renders into two reusable frame buffers in turn, so a tick allocates
+    no image while Tk pastes the previous frame.
+    """
+
+    def __init__(self, root, on_frame):
+        self.root = root
+        self.on_frame = on_frame
+        self.charts = {}
+        # key -> {'updates': [...], 'draw': bool}; queued work for one chart is rendered once
+        self._pending = OrderedDict()
+        self._busy = False
+        self._running = True
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='chart-renderer', daemon=True)
+        self._thread.start()
+
+    def add(self, key, name, fig, artists):
+        self.charts[key] = {'fig': fig, 'canvas': fig.canvas, 'artists': artists, 'background': None,
+                            'limits': None, 'name': name, 'drawn': False,
+                            'frames': [], 'back': 0, 'front': None, 'posted': False}
+
+    def submit(self, key, update=None, draw=True):
+        """Queue an update callable for a chart and optionally a render of it"""
+        with self._cond:
+            job = self._pending.setdefault(key, {'updates': [], 'draw': False})
+            if update:
+                job['updates'].append(update)
+            job['draw'] = job['draw'] or draw
+            self._cond.notify_all()
+
+    def invalidate(self, key):
+        """Drop the cached background, e.g. after a title change (render thread only)"""
+        self.charts[key]['background'] = None
+
+    def reset(self):
+        """Drop every cached background; the next frame of each chart is a full draw"""
+        for key in self.charts:
+            self.submit(key, lambda key=key: self.invalidate(key), draw=False)
+
+    def flush(self, timeout=None):
+        """Block until every queued update has been applied and rendered"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """PNG bytes of the last frame of every chart drawn so far, by chart name (after stop)"""
+        self._thread.join(timeout=5)
+        frames = {}
+        for chart in self.charts.values():
+            if chart['drawn']:
+                buffer = io.BytesIO()
+                Image.fromarray(np.asarray(chart['canvas'].buffer_rgba())).save(buffer, format='PNG')
+                frames[chart['name']] = buffer.getvalue()
+        return frames
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                key, job = self._pending.popitem(last=False)
+                self._busy = True
+            try:
+                chart = self.charts[key]
+                for update in job['updates']:
+                    update()
+                if job['draw']:
+                    self.render(chart)
+                    self.publish(key, chart)
+            except Exception:
+                if self._running:
+                    traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def chart_limits(self, chart):
+        fig = chart['fig']
+        return [fig.bbox.bounds] + [(tuple(ax.get_xlim()), tuple(ax.get_ylim())) for ax in fig.axes]
+
+    def render(self, chart):
+        """Draw a chart into its Agg buffer and copy that into the chart's back frame buffer"""
+        canvas = chart['canvas']
+        limits = self.chart_limits(chart)
+        if chart['background'] is None or chart['limits'] != limits:
+            # A full draw (first show, resize or new axis limits) - cache the static background
+            with metrics.span(f"draw.{chart['name']}"):
+                canvas.draw()
+                chart['background'] = canvas.copy_from_bbox(chart['fig'].bbox)
+                chart['limits'] = limits
+                self.draw_artists(chart)
+        else:
+            with metrics.span(f"blit.{chart['name']}"):
+                canvas.restore_region(chart['background'])
+                self.draw_artists(chart)
+        chart['drawn'] = True
+        rgba = np.asarray(canvas.buffer_rgba())
+        frame = self.back_frame(chart, rgba.shape)
+        with frame['lock']:
+            np.copyto(frame['array'], rgba)
+
+    def draw_artists(self, chart):
+        for artist in chart['artists']:
+            artist.axes.draw_artist(artist)
+
+    @staticmethod
+    def create_frame(shape):
+        """An RGBA array and a PIL image sharing its memory"""
+        array = np.empty(shape, dtype=np.uint8)
+        height, width = shape[:2]
+        image = Image.frombuffer('RGBA', (width, height), array, 'raw', 'RGBA', 0, 1)
+        return {'array': array, 'image': image, 'lock': threading.Lock()}
+
+    def back_frame(self, chart, shape):
+        """The frame buffer to render into next, reallocated only when the canvas size changes"""
+        frames = chart['frames']
+        if not frames or frames[0]['array'].shape != shape:
+            frames[:] = [self.create_frame(shape) for _ in range(2)]
+        return frames[chart['back']]
+
+    def publish(self, key, chart):
+        """Make the back buffer the chart's newest frame and have Tk present it
+
+        At most one present is queued per chart; when Tk falls behind it
+        shows only the newest frame.
+        """
+        with self._cond:
+            chart['front'] = chart['frames'][chart['back']]
+            chart['back'] = 1 - chart['back']
+            post = self._running and not chart['posted']
+            chart['posted'] = chart['posted'] or post
+        if post:
+            self.root.after(0, self.present, key)
+
+    def present(self, key):
+        """Hand a chart's newest frame to on_frame (Tk thread); the buffer is not rewritten meanwhile"""
+        chart = self.charts[key]
+        with self._cond:
+            frame = chart['front']
+            chart['posted'] = False
+        with frame['lock']:
+            self.on_frame(key, frame['image'])
+
+
+class IconCache:
+    """Weather condition icons as ready-to-display PhotoImages
+
+    Icon files are downloaded once into the AssetCache (memory and disk) on a
+    worker thread; PhotoImages are created on the Tk thread and reused.
+    """
+
+    def __init__(self, root, client, assets):
+        self.root = root
+        self.client = client
+        self.assets = assets
+        # (code, size) -> PhotoImage, and code -> (size, callback) pairs waiting for its download
+        self.images = {}
+        self._waiting = {}
+        # Widget -> icon code it should show, so a late download never overwrites a newer icon
+        self._targets = {}
+
+    def show(self, label, code, size=50):
+        """Show the icon for a condition code in a label, now if it is loaded or once it is"""
+        target = str(label)
+        self._targets[target] = code
+        if not code:
+            label.configure(image='')
+            return
+        
+        def apply(photo):
+            if self._targets.get(target) == code and label.winfo_exists():
+                label.configure(image=photo)
+        
+        photo = self.images.get((code, size))
+        if photo is not None:
+            apply(photo)
+            return
+        callbacks = self._waiting.setdefault(code, [])
+        callbacks.append((size, apply))
+        if len(callbacks) == 1:
+            self.client.executor.submit(self.load, code)
+
+    def load(self, code):
+        # Worker thread: bytes from memory, disk or the network, decoded with PIL
+        image = None
+        try:
+            # Codes come from API responses and become file names; accept only the '10d' style
+            if code.isalnum():
+                data = self.assets.fetch(self.client.icon_asset_name(code), lambda: self.client.fetch_icon(code))
+                if data:
+                    image = Image.open(io.BytesIO(data)).convert('RGBA')
+        except (requests.exceptions.RequestException, OSError) as e:
+            logging.getLogger(__name__).info("Icon %s unavailable: %s", code, e)
+        except Exception:
+            logging.getLogger(__name__).exception("Error loading icon %s", code)
+        finally:
+            # Always report back so the waiting callbacks are released and a later show() retries
+            self.root.after(0, self.loaded, code, image)
+
+    def loaded(self, code, image):
+        callbacks = self._waiting.pop(code, [])
+        if image is None:
+            return
+        for size, callback in callbacks:
+            photo = self.images.get((code, size))
+            if photo is None:
+                photo = self.images[(code, size)] = ImageTk.PhotoImage(image.resize((size, size), Image.LANCZOS))
+            callback(photo)
+
+
+class MultiCityDashboard:
+    """Summary table of many cities refreshed together"""
+
+    COLUMNS = [
+        ('city', "City", 160),
+        ('temp', "Temp", 70),
+        ('feels_like', "Feels", 70),
+        ('high_low', "High / Low", 110),
+        ('humidity', "Humidity", 80),
+        ('dew_point', "Dew Pt", 70),
+        ('wind', "Wind", 80),
+        ('trend', "24h Trend", 90),
+        ('outlook', "Forecast Trend", 110),
+        ('description', "Conditions", 180),
+        ('updated', "Updated", 90)
+    ]
+
+    def __init__(self, app, cities):
+        self.app = app
+        self.cities = list(cities)
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Multi-City Dashboard")
+        self.window.geometry("1000x600")
+        self.window.configure(bg='#1a1a2e')
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        
+        toolbar = tk.Frame(self.window, bg='#16213e')
+        toolbar.pack(fill=tk.X, padx=10, pady=10)
+        
+        tk.Button(toolbar, text="Load List...", command=self.load_list,
+                 bg='#2a2a3e', fg='white', font=('Arial', 10, 'bold'),
+                 cursor='hand2', relief=tk.FLAT, padx=15).pack(side=tk.LEFT, padx=(0, 10))
+        tk.Button(toolbar, text="Refresh All", command=self.refresh,
+                 bg='#4CAF50', fg='white', font=('Arial', 10, 'bold'),
+                 cursor='hand2', relief=tk.FLAT, padx=15).pack(side=tk.LEFT)
+        
+        self.summary_var = tk.StringVar()
+        tk.Label(toolbar, textvariable=self.summary_var, font=('Arial', 10),
+                fg='#cccccc', bg='#16213e').pack(side=tk.RIGHT)
+        
+        table_frame = tk.Frame(self.window, bg='#1a1a2e')
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        
+        self.table = ttk.Treeview(table_frame, columns=[c[0] for c in self.COLUMNS], show='headings')
+        for column, heading, width in self.COLUMNS:
+            self.table.heading(column, text=heading)
+            self.table.column(column, width=width, anchor=tk.W if column in ('city', 'description') else tk.CENTER)
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.table.yview)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        self.table.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        self.populate()
+        self.refresh()
+
+    def populate(self):
+        self.table.delete(*self.table.get_children())
+        for city in self.cities:
+            self.table.insert('', tk.END, iid=city, values=(city, '', '', '', '', '', '', '', '', "Waiting...", ''))
+        self.done = 0
+        self.forecasts = {}
+
+    def load_list(self):
+        path = filedialog.askopenfilename(parent=self.window, title="Select city list",
+                                          filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        self.cities = load_city_list(path)
+        self.populate()
+        self.refresh()
+
+    def refresh(self):
+        self.done = 0
+        self.forecasts = {}
+        self.summary_var.set(f"Refreshing {len(self.cities)} cities...")
+        self.app.batch_fetcher.submit(self.cities, self.on_result)
+
+    def on_result(self, city, summary, error):
+        # Called from a worker thread
+        self.app.root.after(0, lambda: self.show_result(city, summary, error))
+
+    def show_result(self, city, summary, error):
+        if not self.window.winfo_exists() or not self.table.exists(city):
+            return
+        self.done += 1
+        self.summary_var.set(f"Updated {min(self.done, len(self.cities))}/{len(self.cities)} cities")
+        
+        if error or summary['current'] is None:
+            self.table.item(city, values=(city, '', '', '', '', '', '', '', '', error or summary['error'], ''))
+        else:
+            self.show_summary(city, summary)
+        
+        if self.done == len(self.cities):
+            self.update_trends()
+
+    def show_summary(self, city, summary):
+        current = summary['current']
+        high_low = ''
+        if summary['daily']:
+            today = summary['daily'][0]
+            high_low = f"{today['high']:.1f} / {today['low']:.1f}°C"
+        self.table.item(city, values=(
+            f"{current['city']}, {current['country']}",
+            f"{current['temp']:.1f}°C",
+            f"{current['feels_like']:.1f}°C",
+            high_low,
+            f"{current['humidity']}%",
+            f"{dew_point(current['temp'], current['humidity']):.1f}°C",
+            f"{current['wind_speed']} m/s",
+            '',
+            '',
+            current['description'],
+            datetime.now().strftime('%H:%M:%S')
+        ))
+        if summary['forecast'] is not None:
+            self.forecasts[city] = summary['forecast']
+
+    def update_trends(self):
+        """Fill the trend columns for every city with batched calls once all results are in"""
+        cities = [city for city in self.forecasts if self.table.exists(city)]
+        if not cities:
+            return
+        stacked = stack_forecasts([self.forecasts[city] for city in cities])
+        derived = derive_metrics(stacked)
+        # Slope over the first 24 hours of each forecast, and over the whole forecast
+        trends = derived['temp_trend'][:, min(derived['window'], derived['temp_trend'].shape[1]) - 1]
+        outlooks = trend_slope(stacked['dt'] / 86400, stacked['temp'])
+        for city, trend, outlook in zip(cities, trends, outlooks):
+            self.table.set(city, 'trend', '' if np.isnan(trend) else f"{trend:+.1f}°C/day")
+            self.table.set(city, 'outlook', '' if np.isnan(outlook) else f"{outlook:+.1f}°C/day")
+
+    def close(self):
+        self.app.multi_city_dashboard = None
+        self.window.destroy()
+
 
 class AdvancedWeatherApp:
-    def __init__(self, root):
+    def __init__(self, root, realtime_window=50, realtime_interval_ms=1000, show_performance=False,
+                 provider='auto', kiosk=False, client=None, asset_dir=DEFAULT_ASSET_DIR,
+                 history_path=DEFAULT_HISTORY_PATH):
         self.root = root
         self.root.title("Advanced Weather Forecast Dashboard")
         self.root.geometry("1400x900")
@@ -22,16 +427,73 @@ class AdvancedWeatherApp:
         
         # Weather data storage
         self.current_weather = {}
-        self.forecast_data = []
+        self.forecast_data = {}
+        self.daily_data = {}
         self.hourly_data = []
         self.animation_running = False
         
         # API key - replace with your OpenWeatherMap API key
-        self.api_key = ""  # Get from openweathermap.org
+        self.api_key = os.environ.get('OPENWEATHER_API_KEY', "")  # Get from openweathermap.org
+        
+        # Response cache - set cache_dir to a folder path to keep responses between runs
+        self.cache_dir = None
+        
+        # Condition icons and the dashboard snapshot shown at startup - pass None to keep
+        # icons in memory only and start without a snapshot
+        self.asset_dir = asset_dir
+        self.assets = AssetCache(self.asset_dir)
+        # Snapshots hold forecast columns, so they follow the response cache's data format
+        self.snapshot_name = f"dashboard_snapshot.v{ResponseCache.DISK_FORMAT}.json"
+        self.snapshot_max_age = 24 * 3600
+        
+        # Cached, pooled and rate-limited API access (free tier quota is 60 calls per minute);
+        # 'auto' uses One Call 3.0 and falls back to the 2.5 endpoints without a subscription
+        # (a client passed in, e.g. one pointed at benchmarks/mock_server.py, is used as is)
+        self.client = client or WeatherClient(self.api_key, cache_dir=self.cache_dir, calls_per_minute=60,
+                                              provider=provider)
+        self.icons = IconCache(self.root, self.client, self.assets)
+        
+        # Observation/forecast history - pass None to disable
+        self.history_path = history_path
+        self.history = WeatherHistoryStore(self.history_path) if self.history_path else None
+        self.history_days = 7
+        self.history_data = None
+        
+        if self.history:
+            self.client.executor.submit(self.history.apply_retention)
+        
+        # Adaptive auto-refresh timing and per-city in-flight tracking
+        self.scheduler = RefreshScheduler()
+        
+        # Fetches run on a small reused pool instead of a new thread per refresh
+        self.refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='weather-refresh')
+        
+        # Multi-city mode
+        self.batch_fetcher = BatchWeatherFetcher(self.client.fetch_city_summary, max_workers=8)
+        self.multi_city_dashboard = None
+        
+        # Live Data stream - number of points kept and milliseconds between ticks
+        self.realtime_window = realtime_window
+        self.realtime_interval_ms = realtime_interval_ms
+        
+        # Optional "Performance" tab with span timings
+        self.show_performance = show_performance
+        
+        # Kiosk mode for unattended displays - memory watchdog checked every 10 minutes,
+        # history retention applied daily instead of only at startup
+        self.kiosk = kiosk
+        self.watchdog = None
+        # Set by the first successful refresh; the watchdog's baseline waits for it (see kiosk_tick)
+        self.warmed_up = False
+        self.watchdog_interval_ms = 10 * 60 * 1000
+        self.last_retention = time.time()
         
         self.setup_ui()
         self.setup_charts()
         
+        if self.kiosk:
+            self.start_kiosk_mode()
+        
     def setup_ui(self):
         # Main container
         main_frame = tk.Frame(self.root, bg='#1a1a2e')
@@ -58,9 +520,15 @@ class AdvancedWeatherApp:
                               cursor='hand2', relief=tk.FLAT, padx=20)
         search_btn.pack(side=tk.LEFT, padx=(0, 10))
         
+        multi_city_btn = tk.Button(search_frame, text="Multi-City", 
+                                  command=self.open_multi_city_dashboard,
+                                  bg='#2a2a3e', fg='white', font=('Arial', 10, 'bold'),
+                                  cursor='hand2', relief=tk.FLAT, padx=20)
+        multi_city_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
         # Auto-refresh toggle
         self.auto_refresh = tk.BooleanVar()
-        refresh_check = tk.Checkbutton(search_frame, text="Auto Refresh (30s)", 
+        refresh_check = tk.Checkbutton(search_frame, text="Auto Refresh", 
                                      variable=self.auto_refresh, font=('Arial', 10),
                                      fg='white', bg='#16213e', selectcolor='#2a2a3e',
                                      command=self.toggle_auto_refresh)
@@ -69,6 +537,7 @@ class AdvancedWeatherApp:
         # Current weather display
         self.current_frame = tk.Frame(top_frame, bg='#16213e')
         self.current_frame.pack(fill=tk.X, padx=20, pady=(0, 15))
+        self.build_current_panel()
         
         # Main content area
         content_frame = tk.Frame(main_frame, bg='#1a1a2e')
@@ -108,6 +577,10 @@ class AdvancedWeatherApp:
         forecast_canvas.pack(side="left", fill="both", expand=True, padx=(10, 0), pady=10)
         forecast_scrollbar.pack(side="right", fill="y", pady=10)
         
+        # Forecast card widgets are pooled and reused across refreshes
+        self.forecast_cards = []
+        self.visible_cards = 0
+        
         # Status bar
         self.status_var = tk.StringVar()
         self.status_var.set("Ready - Enter a city name to get weather data")
@@ -116,341 +589,482 @@ class AdvancedWeatherApp:
         status_bar.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0))
         
     def setup_charts(self):
-        # Temperature chart
-        self.temp_frame = tk.Frame(self.notebook, bg='#1a1a2e')
-        self.notebook.add(self.temp_frame, text="Temperature Trends")
-        
-        self.temp_fig, self.temp_ax = plt.subplots(figsize=(10, 4), facecolor='#1a1a2e')
-        self.temp_ax.set_facecolor('#2a2a3e')
-        self.temp_canvas = FigureCanvasTkAgg(self.temp_fig, self.temp_frame)
-        self.temp_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        # Humidity & Pressure chart
-        self.humidity_frame = tk.Frame(self.notebook, bg='#1a1a2e')
-        self.notebook.add(self.humidity_frame, text="Humidity & Pressure")
-        
-        self.humidity_fig, (self.humidity_ax, self.pressure_ax) = plt.subplots(2, 1, figsize=(10, 4), facecolor='#1a1a2e')
-        self.humidity_ax.set_facecolor('#2a2a3e')
-        self.pressure_ax.set_facecolor('#2a2a3e')
-        self.humidity_canvas = FigureCanvasTkAgg(self.humidity_fig, self.humidity_frame)
-        self.humidity_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
-        # Wind chart
-        self.wind_frame = tk.Frame(self.notebook, bg='#1a1a2e')
-        self.notebook.add(self.wind_frame, text="Wind Analysis")
-        
-        self.wind_fig, self.wind_ax = plt.subplots(figsize=(10, 4), facecolor='#1a1a2e', subplot_kw=dict(projection='polar'))
-        self.wind_ax.set_facecolor('#2a2a3e')
-        self.wind_canvas = FigureCanvasTkAgg(self.wind_fig, self.wind_frame)
-        self.wind_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # Every tab and its Tk canvas exist from the start, but a figure is only built the first
+        # time its tab is opened - until then the canvas shows the frame saved at the last exit
+        self.chart_views = {}
+        self.chart_builders = {}
+        self.deferred_updates = {}
+        self.forecast_charts = {}
+        self.temp_frame = self.add_forecast_tab("Temperature Trends", TemperatureChart)
+        self.humidity_frame = self.add_forecast_tab("Humidity & Pressure", HumidityChart)
+        self.wind_frame = self.add_forecast_tab("Wind Analysis", WindRoseChart)
+        self.comfort_frame = self.add_forecast_tab("Comfort", ComfortChart)
+        self.trend_frame = self.add_forecast_tab("Trends", TrendChart)
+        self.forecast_chart_keys = [str(frame) for frame in (self.temp_frame, self.humidity_frame, self.wind_frame,
+                                                              self.comfort_frame, self.trend_frame)]
+        self.history_frame = self.add_chart_tab("History", self.build_history_chart)
+        self.realtime_frame = self.add_chart_tab("Live Data", self.build_realtime_chart)
         
-        # Real-time data simulation
-        self.realtime_frame = tk.Frame(self.notebook, bg='#1a1a2e')
-        self.notebook.add(self.realtime_frame, text="Live Data")
+        # Charts are rendered off the Tk thread, which only pastes finished frames; the
+        # renderer keeps each static background cached and only blits the data artists.
+        # Hidden tabs are marked dirty and drawn when selected
+        self.renderer = ChartRenderer(self.root, self.show_chart_frame)
+        self.dirty_charts = set()
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
         
-        self.realtime_fig, self.realtime_ax = plt.subplots(figsize=(10, 4), facecolor='#1a1a2e')
-        self.realtime_ax.set_facecolor('#2a2a3e')
-        self.realtime_canvas = FigureCanvasTkAgg(self.realtime_fig, self.realtime_frame)
-        self.realtime_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        if self.show_performance:
+            self.setup_performance_tab()
         
         # Initialize real-time data
-        self.realtime_data = {'time': [], 'temp': [], 'humidity': []}
+        self.realtime_data = {key: RingBuffer(self.realtime_window) for key in ('time', 'temp', 'humidity')}
+        # Held while the Tk thread appends and while the render thread copies the buffers into the chart
+        self.realtime_lock = threading.Lock()
         self.start_realtime_animation()
         
+        # No figure is built before the window (and any snapshot) has been drawn once
+        self.charts_ready = False
+        self.root.after(100, self.show_first_chart)
+        
+    def add_forecast_tab(self, title, chart_class):
+        """Tab for one of the forecast charts shared with the server (weather_charts)"""
+        def build():
+            chart = self.forecast_charts[key] = chart_class(self.create_chart_figure(), animated=True)
+            return chart.fig, chart.artists
+        
+        frame = self.add_chart_tab(title, build)
+        key = str(frame)
+        return frame
+        
+    def build_history_chart(self):
+        # Observed history
+        self.history_chart = HistoryChart(self.create_chart_figure(), animated=True, days=self.history_days)
+        return self.history_chart.fig, self.history_chart.artists
+        
+    def build_realtime_chart(self):
+        # Real-time data simulation
+        self.realtime_chart = LiveDataChart(self.create_chart_figure(), animated=True,
+                                            seconds=self.realtime_window * self.realtime_interval_ms / 1000)
+        return self.realtime_chart.fig, self.realtime_chart.artists
+        
+    def create_chart_figure(self):
+        """Figure with an Agg canvas; only the render thread draws it"""
+        return create_figure()
+        
+    def add_chart_tab(self, title, builder):
+        """Notebook tab with the Tk canvas its chart frames are pasted into; builder creates the figure later"""
+        frame = tk.Frame(self.notebook, bg='#1a1a2e')
+        self.notebook.add(frame, text=title)
+        key = str(frame)
+        widget = tk.Canvas(frame, width=1000, height=400, bg='#1a1a2e', highlightthickness=0)
+        widget.pack(fill=tk.BOTH, expand=True)
+        self.chart_views[key] = {'widget': widget, 'item': widget.create_image(0, 0, anchor=tk.NW), 
+                                 'photo': None, 'snapshot': None, 'name': title}
+        self.chart_builders[key] = builder
+        widget.bind('<Configure>', lambda event: self.on_chart_resize(key, event.width, event.height))
+        return frame
+        
+    def build_chart(self, key):
+        """Create a chart's figure and artists, then apply the latest update it was sent"""
+        view = self.chart_views[key]
+        with metrics.span(f"build.{view['name']}"):
+            fig, artists = self.chart_builders.pop(key)()
+            width, height = view['widget'].winfo_width(), view['widget'].winfo_height()
+            if width > 1 and height > 1:
+                fig.set_size_inches(width / fig.dpi, height / fig.dpi)
+        self.renderer.add(key, view['name'], fig, artists)
+        self.redraw_chart(key, self.deferred_updates.pop(key, None))
+        
+    def on_chart_resize(self, key, width, height):
+        chart = self.renderer.charts.get(key)
+        if chart and width > 1 and height > 1:
+            fig = chart['fig']
+            self.redraw_chart(key, lambda: fig.set_size_inches(width / fig.dpi, height / fig.dpi))
+        
+    def redraw_chart(self, key, update=None):
+        """Queue an artist update for a chart; only the visible tab is rendered right away"""
+        visible = self.notebook.select() == key
+        if key in self.chart_builders:
+            # Not built yet; every update sets all of a chart's data, so only the latest is kept
+            if update:
+                self.deferred_updates[key] = update
+            if visible and self.charts_ready:
+                self.root.after_idle(self.on_tab_changed)
+            return
+        if visible:
+            self.dirty_charts.discard(key)
+        else:
+            self.dirty_charts.add(key)
+        self.renderer.submit(key, update, draw=visible)
+        
+    def show_chart_frame(self, key, image):
+        """Paste a frame rendered by the ChartRenderer into its Tk canvas
+
+        The image is one of the renderer's reused buffers: it is copied into
+        the PhotoImage, never kept.
+        """
+        view = self.chart_views[key]
+        with metrics.span(f"present.{view['name']}"):
+            photo = view['photo']
+            if photo is None or (photo.width(), photo.height()) != image.size:
+                view['photo'] = ImageTk.PhotoImage(image)
+                view['widget'].itemconfigure(view['item'], image=view['photo'])
+            else:
+                photo.paste(image)
+            # The snapshot from the last run is no longer needed once a live frame is shown
+            view['snapshot'] = None
+        
+    def show_first_chart(self):
+        self.charts_ready = True
+        self.on_tab_changed()
+        
+    def on_tab_changed(self, event=None):
+        key = self.notebook.select()
+        if key in self.chart_builders:
+            if self.charts_ready:
+                self.build_chart(key)
+        elif key in self.dirty_charts:
+            self.redraw_chart(key)
+        
     def get_weather(self):
         city = self.city_entry.get().strip()
         if not city:
             messagebox.showwarning("Input Error", "Please enter a city name")
             return
             
+        if not self.scheduler.begin(city):
+            self.status_var.set(f"Already fetching weather data for {city}...")
+            return
+            
         self.status_var.set(f"Fetching weather data for {city}...")
         
-        # Run in separate thread to prevent UI freezing
-        threading.Thread(target=self.fetch_weather_data, args=(city,), daemon=True).start()
+        # Run on the refresh pool to prevent UI freezing
+        self.refresh_executor.submit(self.fetch_weather_data, city)
         
+    def open_multi_city_dashboard(self, cities=None):
+        if self.multi_city_dashboard is not None:
+            self.multi_city_dashboard.window.lift()
+            return
+        
+        if cities is None:
+            path = filedialog.askopenfilename(title="Select city list",
+                                              filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+            if not path:
+                return
+            cities = load_city_list(path)
+        
+        self.multi_city_dashboard = MultiCityDashboard(self, cities)
+        
+    @metrics.timed('fetch_weather_data')
     def fetch_weather_data(self, city):
         try:
-            # Current weather
-            current_url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={self.api_key}&units=metric"
-            current_response = requests.get(current_url, timeout=10)
+            # Current weather and 5-day forecast are requested concurrently
+            statuses = {}
             
-            if current_response.status_code == 200:
-                self.current_weather = current_response.json()
+            # Update the UI in the main thread as each response arrives
+            for endpoint, status, data in self.client.fetch(city):
+                statuses[endpoint] = status
                 
-                # 5-day forecast
-                forecast_url = f"http://api.openweathermap.org/data/2.5/forecast?q={city}&appid={self.api_key}&units=metric"
-                forecast_response = requests.get(forecast_url, timeout=10)
-                
-                if forecast_response.status_code == 200:
-                    forecast_data = forecast_response.json()
-                    self.forecast_data = forecast_data['list']
-                    
-                    # Update UI in main thread
+                if status != 200:
+                    continue
+                if endpoint == 'weather':
+                    self.current_weather = data
                     self.root.after(0, self.update_weather_display)
-                    self.root.after(0, lambda: self.status_var.set(f"Weather data updated for {city}"))
+                    if self.history:
+                        self.history.record_observation(data)
+                        self.history_data = self.history.observations(
+                            self.history.city_key(data['name'], data['sys']['country']),
+                            since=time.time() - self.history_days * 86400)
+                        self.root.after(0, self.update_history_chart)
                 else:
-                    self.root.after(0, lambda: self.status_var.set("Error fetching forecast data"))
+                    # Already compact columns; the raw entries were never kept
+                    self.forecast_data = data['forecast']
+                    self.daily_data = select_daily(data)
+                    self.root.after(0, self.update_forecast_display)
+                    if self.history:
+                        self.history.record_forecast(data['city'], self.forecast_data)
+            
+            if statuses['weather'] != 200:
+                message = describe_status(statuses['weather'], city)
+                self.scheduler.fail(city, statuses['weather'])
+            elif statuses['forecast'] != 200:
+                message = "Error fetching forecast data"
+                self.scheduler.fail(city, statuses['forecast'])
             else:
-                error_msg = f"City not found: {city}"
-                if current_response.status_code == 401:
-                    error_msg = "API key invalid or missing"
-                self.root.after(0, lambda: self.status_var.set(error_msg))
+                message = f"Weather data updated for {city}"
+                self.warmed_up = True
+                self.scheduler.succeed(city, observed_at=self.current_weather.get('dt'),
+                                       expires_at=self.client.expires_at(city))
                 
         except requests.exceptions.RequestException as e:
-            self.root.after(0, lambda: self.status_var.set(f"Network error: {str(e)}"))
+            message = f"Network error: {str(e)}"
+            self.scheduler.fail(city)
         except Exception as e:
-            self.root.after(0, lambda: self.status_var.set(f"Error: {str(e)}"))
-            
-    def update_weather_display(self):
-        # Clear current weather display
-        for widget in self.current_frame.winfo_children():
-            widget.destroy()
-            
-        if not self.current_weather:
-            return
-            
-        # Current weather info
-        city_name = self.current_weather['name']
-        country = self.current_weather['sys']['country']
-        temp = self.current_weather['main']['temp']
-        feels_like = self.current_weather['main']['feels_like']
-        humidity = self.current_weather['main']['humidity']
-        pressure = self.current_weather['main']['pressure']
-        description = self.current_weather['weather'][0]['description'].title()
-        wind_speed = self.current_weather['wind']['speed']
-        wind_dir = self.current_weather['wind'].get('deg', 0)
-        
-        # Current weather layout
-        current_info = tk.Frame(self.current_frame, bg='#16213e')
-        current_info.pack(fill=tk.X)
+            message = f"Error: {str(e)}"
+            self.scheduler.fail(city)
         
-        # Left side - main info
-        left_info = tk.Frame(current_info, bg='#16213e')
-        left_info.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.root.after(0, lambda: self.on_fetch_complete(city, message))
         
-        city_label = tk.Label(left_info, text=f"{city_name}, {country}", 
-                            font=('Arial', 18, 'bold'), fg='#4CAF50', bg='#16213e')
-        city_label.pack(anchor=tk.W)
+    def on_fetch_complete(self, city, message):
+        if self.auto_refresh.get():
+            # auto_refresh_tick leaves rescheduling to this completion, so it must always schedule,
+            # even when the entry was edited while the fetch ran (then it times the entry's city)
+            self.start_auto_refresh()
+            if city == self.city_entry.get().strip():
+                message = f"{message} - {self.scheduler.describe(city)}"
+        self.status_var.set(message)
+            
+    def build_current_panel(self):
+        """Create the current-conditions widgets once; refreshes only update their variables"""
+        self.current_vars = {key: tk.StringVar() for key in 
+                             ('city', 'temp', 'description', 'feels_like', 
+                              'humidity', 'pressure', 'wind_speed', 'wind_deg')}
         
-        temp_label = tk.Label(left_info, text=f"{temp:.1f}°C", 
-                            font=('Arial', 32, 'bold'), fg='white', bg='#16213e')
-        temp_label.pack(anchor=tk.W)
+        # Current weather layout (shown once data arrives)
+        self.current_info = tk.Frame(self.current_frame, bg='#16213e')
         
-        desc_label = tk.Label(left_info, text=description, 
-                            font=('Arial', 14), fg='#cccccc', bg='#16213e')
-        desc_label.pack(anchor=tk.W)
+        # Left side - main info
+        left_info = tk.Frame(self.current_info, bg='#16213e')
+        left_info.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
-        feels_label = tk.Label(left_info, text=f"Feels like {feels_like:.1f}°C", 
-                             font=('Arial', 12), fg='#cccccc', bg='#16213e')
-        feels_label.pack(anchor=tk.W)
+        tk.Label(left_info, textvariable=self.current_vars['city'], 
+                font=('Arial', 18, 'bold'), fg='#4CAF50', bg='#16213e').pack(anchor=tk.W)
+        temp_row = tk.Frame(left_info, bg='#16213e')
+        temp_row.pack(anchor=tk.W)
+        tk.Label(temp_row, textvariable=self.current_vars['temp'], 
+                font=('Arial', 32, 'bold'), fg='white', bg='#16213e').pack(side=tk.LEFT)
+        self.current_icon = tk.Label(temp_row, bg='#16213e')
+        self.current_icon.pack(side=tk.LEFT, padx=(10, 0))
+        tk.Label(left_info, textvariable=self.current_vars['description'], 
+                font=('Arial', 14), fg='#cccccc', bg='#16213e').pack(anchor=tk.W)
+        tk.Label(left_info, textvariable=self.current_vars['feels_like'], 
+                font=('Arial', 12), fg='#cccccc', bg='#16213e').pack(anchor=tk.W)
         
         # Right side - additional info
-        right_info = tk.Frame(current_info, bg='#16213e')
+        right_info = tk.Frame(self.current_info, bg='#16213e')
         right_info.pack(side=tk.RIGHT, padx=20)
         
         details = [
-            ("Humidity", f"{humidity}%"),
-            ("Pressure", f"{pressure} hPa"),
-            ("Wind Speed", f"{wind_speed} m/s"),
-            ("Wind Direction", f"{wind_dir}°")
+            ("Humidity", 'humidity'),
+            ("Pressure", 'pressure'),
+            ("Wind Speed", 'wind_speed'),
+            ("Wind Direction", 'wind_deg')
         ]
         
-        for label, value in details:
+        for label, key in details:
             detail_frame = tk.Frame(right_info, bg='#16213e')
             detail_frame.pack(fill=tk.X, pady=2)
             
             tk.Label(detail_frame, text=f"{label}:", font=('Arial', 10), 
                    fg='#cccccc', bg='#16213e').pack(side=tk.LEFT)
-            tk.Label(detail_frame, text=value, font=('Arial', 10, 'bold'), 
+            tk.Label(detail_frame, textvariable=self.current_vars[key], font=('Arial', 10, 'bold'), 
                    fg='white', bg='#16213e').pack(side=tk.RIGHT)
         
-        # Update charts
+    @metrics.timed('update_weather_display')
+    def update_weather_display(self):
+        if not self.current_weather:
+            self.current_info.pack_forget()
+            return
+            
+        # Current weather info
+        current = parse_current_weather(self.current_weather)
+        
+        values = {
+            'city': f"{current['city']}, {current['country']}",
+            'temp': f"{current['temp']:.1f}°C",
+            'description': current['description'],
+            'feels_like': f"Feels like {current['feels_like']:.1f}°C",
+            'humidity': f"{current['humidity']}%",
+            'pressure': f"{current['pressure']} hPa",
+            'wind_speed': f"{current['wind_speed']} m/s",
+            'wind_deg': f"{current['wind_deg']}°"
+        }
+        for key, value in values.items():
+            self.current_vars[key].set(value)
+        self.icons.show(self.current_icon, current['icon'], size=64)
+        
+        if not self.current_info.winfo_manager():
+            self.current_info.pack(fill=tk.X)
+        
+    def update_forecast_display(self):
         self.update_charts()
         self.update_forecast_cards()
         
+    @metrics.timed('update_charts')
     def update_charts(self):
-        if not self.forecast_data:
+        if not self.forecast_data or self.forecast_data['dt'].size == 0:
             return
             
-        # Prepare data
-        times = []
-        temps = []
-        humidity_vals = []
-        pressure_vals = []
-        wind_speeds = []
-        wind_dirs = []
-        
-        for item in self.forecast_data[:24]:  # 24 hours of data
-            times.append(datetime.fromtimestamp(item['dt']))
-            temps.append(item['main']['temp'])
-            humidity_vals.append(item['main']['humidity'])
-            pressure_vals.append(item['main']['pressure'])
-            wind_speeds.append(item['wind']['speed'])
-            wind_dirs.append(item['wind'].get('deg', 0))
-        
-        # Temperature chart
-        self.temp_ax.clear()
-        self.temp_ax.plot(times, temps, color='#FF6B6B', linewidth=2, marker='o', markersize=4)
-        self.temp_ax.set_title('Temperature Trend (24h)', color='white', fontsize=14, fontweight='bold')
-        self.temp_ax.set_ylabel('Temperature (°C)', color='white')
-        self.temp_ax.tick_params(colors='white')
-        self.temp_ax.grid(True, alpha=0.3, color='white')
-        self.temp_fig.autofmt_xdate()
-        self.temp_canvas.draw()
-        
-        # Humidity chart
-        self.humidity_ax.clear()
-        self.humidity_ax.plot(times, humidity_vals, color='#4ECDC4', linewidth=2, marker='s', markersize=4)
-        self.humidity_ax.set_title('Humidity Levels', color='white', fontsize=12, fontweight='bold')
-        self.humidity_ax.set_ylabel('Humidity (%)', color='white')
-        self.humidity_ax.tick_params(colors='white')
-        self.humidity_ax.grid(True, alpha=0.3, color='white')
-        
-        # Pressure chart
-        self.pressure_ax.clear()
-        self.pressure_ax.plot(times, pressure_vals, color='#45B7D1', linewidth=2, marker='^', markersize=4)
-        self.pressure_ax.set_title('Atmospheric Pressure', color='white', fontsize=12, fontweight='bold')
-        self.pressure_ax.set_ylabel('Pressure (hPa)', color='white')
-        self.pressure_ax.tick_params(colors='white')
-        self.pressure_ax.grid(True, alpha=0.3, color='white')
-        
-        self.humidity_fig.tight_layout()
-        self.humidity_canvas.draw()
-        
-        # Wind chart (polar)
-        self.wind_ax.clear()
-        wind_dirs_rad = np.radians(wind_dirs)
-        self.wind_ax.scatter(wind_dirs_rad, wind_speeds, c=wind_speeds, cmap='viridis', s=50, alpha=0.7)
-        self.wind_ax.set_title('Wind Pattern (24h)', color='white', fontsize=14, fontweight='bold', pad=20)
-        self.wind_ax.set_theta_zero_location('N')
-        self.wind_ax.set_theta_direction(-1)
-        self.wind_ax.tick_params(colors='white')
-        self.wind_canvas.draw()
+        # One derive_metrics call feeds both the comfort and the trend charts
+        forecast = self.forecast_data
+        derived = derive_metrics(forecast)
+        for key in self.forecast_chart_keys:
+            self.redraw_chart(key, lambda key=key: self.update_forecast_chart(key, forecast, derived))
         
-    def update_forecast_cards(self):
-        # Clear existing forecast cards
-        for widget in self.forecast_scroll_frame.winfo_children():
-            widget.destroy()
-            
-        if not self.forecast_data:
+    def update_forecast_chart(self, key, forecast, derived):
+        # Runs on the render thread; titles are part of the cached background, so a new one forces a full redraw
+        if self.forecast_charts[key].update(forecast, derived):
+            self.renderer.invalidate(key)
+        
+    def create_forecast_card(self):
+        card = {key: tk.StringVar() for key in ('date', 'high', 'low', 'description', 'humidity', 'wind')}
+        card_frame = tk.Frame(self.forecast_scroll_frame, bg='#2a2a3e', relief=tk.RAISED, bd=2)
+        card['frame'] = card_frame
+        
+        # Date
+        tk.Label(card_frame, textvariable=card['date'], 
+                font=('Arial', 12, 'bold'), fg='#4CAF50', bg='#2a2a3e').pack(pady=(10, 5))
+        
+        # Condition icon
+        card['icon'] = tk.Label(card_frame, bg='#2a2a3e')
+        card['icon'].pack()
+        
+        # Temperature range
+        temp_frame = tk.Frame(card_frame, bg='#2a2a3e')
+        temp_frame.pack(fill=tk.X, padx=10)
+        
+        tk.Label(temp_frame, textvariable=card['high'], 
+               font=('Arial', 10), fg='#FF6B6B', bg='#2a2a3e').pack(side=tk.LEFT)
+        tk.Label(temp_frame, textvariable=card['low'], 
+               font=('Arial', 10), fg='#4ECDC4', bg='#2a2a3e').pack(side=tk.RIGHT)
+        
+        # Weather description (noon data if available, otherwise first entry)
+        tk.Label(card_frame, textvariable=card['description'], font=('Arial', 10), 
+               fg='#cccccc', bg='#2a2a3e').pack(pady=5)
+        
+        # Additional details
+        details_frame = tk.Frame(card_frame, bg='#2a2a3e')
+        details_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        tk.Label(details_frame, textvariable=card['humidity'], font=('Arial', 9), 
+               fg='#cccccc', bg='#2a2a3e').pack(side=tk.LEFT)
+        tk.Label(details_frame, textvariable=card['wind'], font=('Arial', 9), 
+               fg='#cccccc', bg='#2a2a3e').pack(side=tk.RIGHT)
+        return card
+        
+    @metrics.timed('update_history_chart')
+    def update_history_chart(self):
+        history = self.history_data
+        if not history or history['dt'].size == 0:
             return
         
-        # Group forecast by day
-        daily_forecasts = {}
-        for item in self.forecast_data:
-            date = datetime.fromtimestamp(item['dt']).strftime('%Y-%m-%d')
-            if date not in daily_forecasts:
-                daily_forecasts[date] = []
-            daily_forecasts[date].append(item)
-        
-        # Create forecast cards
-        for i, (date, day_data) in enumerate(list(daily_forecasts.items())[:5]):
-            card_frame = tk.Frame(self.forecast_scroll_frame, bg='#2a2a3e', relief=tk.RAISED, bd=2)
-            card_frame.pack(fill=tk.X, padx=10, pady=5)
-            
-            # Date
-            date_obj = datetime.strptime(date, '%Y-%m-%d')
-            date_label = tk.Label(card_frame, text=date_obj.strftime('%A, %b %d'), 
-                                font=('Arial', 12, 'bold'), fg='#4CAF50', bg='#2a2a3e')
-            date_label.pack(pady=(10, 5))
-            
-            # Get day summary (use noon data if available, otherwise first entry)
-            noon_data = None
-            for item in day_data:
-                hour = datetime.fromtimestamp(item['dt']).hour
-                if hour == 12:
-                    noon_data = item
-                    break
-            
-            if not noon_data:
-                noon_data = day_data[0]
-            
-            # Temperature range
-            max_temp = max(item['main']['temp_max'] for item in day_data)
-            min_temp = min(item['main']['temp_min'] for item in day_data)
-            
-            temp_frame = tk.Frame(card_frame, bg='#2a2a3e')
-            temp_frame.pack(fill=tk.X, padx=10)
-            
-            tk.Label(temp_frame, text=f"High: {max_temp:.1f}°C", 
-                   font=('Arial', 10), fg='#FF6B6B', bg='#2a2a3e').pack(side=tk.LEFT)
-            tk.Label(temp_frame, text=f"Low: {min_temp:.1f}°C", 
-                   font=('Arial', 10), fg='#4ECDC4', bg='#2a2a3e').pack(side=tk.RIGHT)
-            
-            # Weather description
-            desc = noon_data['weather'][0]['description'].title()
-            tk.Label(card_frame, text=desc, font=('Arial', 10), 
-                   fg='#cccccc', bg='#2a2a3e').pack(pady=5)
-            
-            # Additional details
-            details_frame = tk.Frame(card_frame, bg='#2a2a3e')
-            details_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
-            
-            humidity = noon_data['main']['humidity']
-            wind = noon_data['wind']['speed']
-            
-            tk.Label(details_frame, text=f"💧 {humidity}%", font=('Arial', 9), 
-                   fg='#cccccc', bg='#2a2a3e').pack(side=tk.LEFT)
-            tk.Label(details_frame, text=f"💨 {wind:.1f} m/s", font=('Arial', 9), 
-                   fg='#cccccc', bg='#2a2a3e').pack(side=tk.RIGHT)
+        local_time = history['dt'] + local_utc_offsets(history['dt'])
+        times = mdates.date2num(local_time.astype('datetime64[s]'))
+        
+        self.redraw_chart(str(self.history_frame), lambda: self.history_chart.update(times, history['temp']))
+        
+    @metrics.timed('update_forecast_cards')
+    def update_forecast_cards(self):
+        days = summarize_daily_forecast(self.daily_data)
+        
+        # Grow the card pool only when more days are needed than ever before
+        while len(self.forecast_cards) < len(days):
+            self.forecast_cards.append(self.create_forecast_card())
+        
+        for card, day in zip(self.forecast_cards, days):
+            card['date'].set(day['date'].strftime('%A, %b %d'))
+            card['high'].set(f"High: {day['high']:.1f}°C")
+            card['low'].set(f"Low: {day['low']:.1f}°C")
+            card['description'].set(day['description'])
+            card['humidity'].set(f"💧 {day['humidity']}%")
+            card['wind'].set(f"💨 {day['wind_speed']:.1f} m/s")
+            self.icons.show(card['icon'], day['icon'])
+        
+        # Show/hide pooled cards; packing in pool order keeps them sorted by date
+        for card in self.forecast_cards[self.visible_cards:len(days)]:
+            card['frame'].pack(fill=tk.X, padx=10, pady=5)
+        for card in self.forecast_cards[len(days):self.visible_cards]:
+            card['frame'].pack_forget()
+        self.visible_cards = len(days)
     
     def start_realtime_animation(self):
         """Start animated real-time data simulation"""
         self.animation_running = True
         
-        def update_realtime_data():
+        def tick():
             if not self.animation_running:
                 return
-                
-            current_time = datetime.now()
-            base_temp = 20 if not self.current_weather else self.current_weather['main']['temp']
-            base_humidity = 50 if not self.current_weather else self.current_weather['main']['humidity']
-            
-            # Simulate fluctuating data
-            temp_variation = np.sin(time.time() * 0.1) * 2 + np.random.normal(0, 0.5)
-            humidity_variation = np.cos(time.time() * 0.15) * 5 + np.random.normal(0, 1)
-            
-            new_temp = base_temp + temp_variation
-            new_humidity = max(0, min(100, base_humidity + humidity_variation))
-            
-            self.realtime_data['time'].append(current_time)
-            self.realtime_data['temp'].append(new_temp)
-            self.realtime_data['humidity'].append(new_humidity)
-            
-            # Keep only last 50 points
-            if len(self.realtime_data['time']) > 50:
-                for key in self.realtime_data:
-                    self.realtime_data[key] = self.realtime_data[key][-50:]
-            
-            # Update chart
-            self.realtime_ax.clear()
-            
-            if len(self.realtime_data['time']) > 1:
-                # Temperature line
-                temp_line = self.realtime_ax.plot(self.realtime_data['time'], self.realtime_data['temp'], 
-                                                'r-', linewidth=2, label='Temperature (°C)', alpha=0.8)
-                
-                # Humidity line (scaled)
-                humidity_scaled = [h/5 for h in self.realtime_data['humidity']]  # Scale for better visualization
-                humidity_line = self.realtime_ax.plot(self.realtime_data['time'], humidity_scaled, 
-                                                    'b-', linewidth=2, label='Humidity (%/5)', alpha=0.8)
-                
-                self.realtime_ax.set_title('Live Weather Simulation', color='white', fontsize=14, fontweight='bold')
-                self.realtime_ax.set_ylabel('Value', color='white')
-                self.realtime_ax.tick_params(colors='white')
-                self.realtime_ax.grid(True, alpha=0.3, color='white')
-                self.realtime_ax.legend()
-                
-                # Format x-axis
-                self.realtime_fig.autofmt_xdate()
-            
-            self.realtime_canvas.draw()
+            self.update_realtime_data()
             
             # Schedule next update
             if self.animation_running:
-                self.root.after(1000, update_realtime_data)  # Update every second
+                self.root.after(self.realtime_interval_ms, tick)
         
-        update_realtime_data()
+        tick()
+    
+    @metrics.timed('update_realtime_data')
+    def update_realtime_data(self):
+        """Sample one simulated reading and queue it for the Live Data chart"""
+        now = time.time()
+        base_temp = 20 if not self.current_weather else self.current_weather['main']['temp']
+        base_humidity = 50 if not self.current_weather else self.current_weather['main']['humidity']
+        
+        # Simulate fluctuating data
+        temp_variation = np.sin(now * 0.1) * 2 + np.random.normal(0, 0.5)
+        humidity_variation = np.cos(now * 0.15) * 5 + np.random.normal(0, 1)
+        
+        new_temp = base_temp + temp_variation
+        new_humidity = max(0, min(100, base_humidity + humidity_variation))
+        
+        with self.realtime_lock:
+            self.realtime_data['time'].append(now)
+            self.realtime_data['temp'].append(new_temp)
+            self.realtime_data['humidity'].append(new_humidity / 5)  # Scale for better visualization
+        self.redraw_chart(str(self.realtime_frame), self.draw_realtime_data)
+    
+    def draw_realtime_data(self):
+        """Copy the newest readings into the Live Data chart (render thread)"""
+        with self.realtime_lock:
+            self.realtime_chart.update(self.realtime_data['time'].view(), self.realtime_data['temp'].view(),
+                                       self.realtime_data['humidity'].view())
+    
+    def setup_performance_tab(self):
+        self.performance_frame = tk.Frame(self.notebook, bg='#1a1a2e')
+        self.notebook.add(self.performance_frame, text="Performance")
+        
+        toolbar = tk.Frame(self.performance_frame, bg='#1a1a2e')
+        toolbar.pack(fill=tk.X, pady=(5, 5))
+        for text, command in (("Export JSON", self.export_metrics_json), 
+                              ("Export Prometheus", self.export_metrics_prometheus), 
+                              ("Reset", metrics.reset)):
+            tk.Button(toolbar, text=text, command=command, bg='#2a2a3e', fg='white', 
+                     font=('Arial', 10, 'bold'), cursor='hand2', relief=tk.FLAT, 
+                     padx=15).pack(side=tk.LEFT, padx=(0, 10))
+        
+        columns = [('span', "Span", 220), ('count', "Count", 70), ('mean', "Mean ms", 90), 
+                   ('p50', "p50 ms", 90), ('p95', "p95 ms", 90), ('p99', "p99 ms", 90), ('max', "Max ms", 90)]
+        self.performance_table = ttk.Treeview(self.performance_frame, columns=[c[0] for c in columns], 
+                                              show='headings')
+        for column, heading, width in columns:
+            self.performance_table.heading(column, text=heading)
+            self.performance_table.column(column, width=width, anchor=tk.W if column == 'span' else tk.E)
+        self.performance_table.pack(fill=tk.BOTH, expand=True)
+        
+        self.update_performance_tab()
+    
+    def update_performance_tab(self):
+        # Only rebuild the table while the tab is visible
+        if self.notebook.select() == str(self.performance_frame):
+            self.performance_table.delete(*self.performance_table.get_children())
+            for name, stats in metrics.summary().items():
+                self.performance_table.insert('', tk.END, values=(
+                    name, stats['count'], f"{stats['mean_ms']:.2f}", f"{stats['p50_ms']:.2f}",
+                    f"{stats['p95_ms']:.2f}", f"{stats['p99_ms']:.2f}", f"{stats['max_ms']:.2f}"))
+        self.root.after(2000, self.update_performance_tab)
+    
+    def export_metrics(self, content, extension, description):
+        path = filedialog.asksaveasfilename(defaultextension=extension, 
+                                            filetypes=[(description, f"*{extension}"), ("All files", "*.*")])
+        if not path:
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.status_var.set(f"Performance data exported to {path}")
+    
+    def export_metrics_json(self):
+        self.export_metrics(metrics.to_json(), '.json', "JSON files")
+    
+    def export_metrics_prometheus(self):
+        self.export_metrics(metrics.to_prometheus(), '.prom', "Prometheus text files")
     
     def toggle_auto_refresh(self):
         if self.auto_refresh.get():
@@ -459,24 +1073,136 @@ class AdvancedWeatherApp:
             self.stop_auto_refresh()
     
     def start_auto_refresh(self):
-        if hasattr(self, 'refresh_job'):
-            self.root.after_cancel(self.refresh_job)
-        
-        def auto_refresh():
-            if self.auto_refresh.get() and self.city_entry.get().strip():
-                self.get_weather()
-            if self.auto_refresh.get():
-                self.refresh_job = self.root.after(30000, auto_refresh)  # 30 seconds
+        city = self.city_entry.get().strip()
+        self.schedule_auto_refresh(self.scheduler.delay(city) if city else self.scheduler.min_interval)
+    
+    def schedule_auto_refresh(self, delay):
+        self.stop_auto_refresh()
+        self.refresh_job = self.root.after(int(delay * 1000), self.auto_refresh_tick)
+    
+    def auto_refresh_tick(self):
+        if not self.auto_refresh.get():
+            return
+        if self.multi_city_dashboard is not None:
+            self.multi_city_dashboard.refresh()
         
-        self.refresh_job = self.root.after(30000, auto_refresh)
+        # The next tick is scheduled when the fetch completes, so slow requests never overlap
+        city = self.city_entry.get().strip()
+        if city and self.scheduler.begin(city):
+            self.status_var.set(f"Refreshing weather data for {city}...")
+            self.refresh_executor.submit(self.fetch_weather_data, city)
+        else:
+            self.schedule_auto_refresh(self.scheduler.min_interval)
     
     def stop_auto_refresh(self):
         if hasattr(self, 'refresh_job'):
             self.root.after_cancel(self.refresh_job)
+            del self.refresh_job
+    
+    def start_kiosk_mode(self):
+        """Full screen with auto-refresh and a watchdog that resets caches if memory keeps growing"""
+        self.root.attributes('-fullscreen', True)
+        self.root.bind('<Escape>', lambda e: self.root.attributes('-fullscreen', False))
+        self.auto_refresh.set(True)
+        
+        self.watchdog = MemoryWatchdog()
+        self.add_watchdog_resets(self.watchdog)
+        self.kiosk_tick()
+    
+    def add_watchdog_resets(self, watchdog):
+        """Register everything the memory watchdog may drop once growth passes its budget"""
+        watchdog.add_reset("response cache", self.client.cache.clear)
+        watchdog.add_reset("asset cache", self.assets.clear)
+        watchdog.add_reset("metrics", metrics.reset)
+        watchdog.add_reset("live data", self.reset_realtime_data)
+        watchdog.add_reset("chart backgrounds", self.renderer.reset)
+    
+    def kiosk_tick(self):
+        # The first check sets the watchdog's baseline, so it waits for a successful refresh: before
+        # that, figures, icons and frames are still loading and would all count as growth
+        if self.warmed_up:
+            self.watchdog.check()
+        if self.history and time.time() - self.last_retention > 86400:
+            self.client.executor.submit(self.history.apply_retention)
+            self.last_retention = time.time()
+        self.kiosk_job = self.root.after(self.watchdog_interval_ms, self.kiosk_tick)
+    
+    def reset_realtime_data(self):
+        with self.realtime_lock:
+            for buffer in self.realtime_data.values():
+                buffer.clear()
+    
+    @metrics.timed('restore_snapshot')
+    def restore_snapshot(self):
+        """Show the dashboard saved at the last exit while fresh data loads; returns its city or None"""
+        snapshot = self.assets.load_json(self.snapshot_name) if self.asset_dir else None
+        if not snapshot or time.time() - snapshot['saved_at'] > self.snapshot_max_age:
+            return None
+        
+        # Tk decodes the saved PNGs itself, so no figure is needed to show them
+        for view in self.chart_views.values():
+            frame = snapshot['charts'].get(view['name'])
+            if frame and view['photo'] is None:
+                view['snapshot'] = tk.PhotoImage(data=frame)
+                view['widget'].itemconfigure(view['item'], image=view['snapshot'])
+        
+        if snapshot['current_weather']:
+            self.current_weather = snapshot['current_weather']
+            self.update_weather_display()
+        if snapshot['forecast'] is not None:
+            self.forecast_data = snapshot['forecast']
+            self.daily_data = snapshot['daily'] if snapshot['daily'] is not None else self.forecast_data
+            self.update_forecast_cards()
+            # Queued for each figure, which is built when its tab is first opened
+            self.update_charts()
+        
+        saved = datetime.fromtimestamp(snapshot['saved_at']).strftime('%H:%M')
+        self.status_var.set(f"Showing data saved at {saved} - refreshing...")
+        return snapshot['city']
+    
+    def save_snapshot(self):
+        """Save the displayed data and last chart frames for the next launch (after the renderer stops)"""
+        if not self.asset_dir or not self.current_weather:
+            return
+        frames = self.renderer.snapshot()
+        self.assets.save_json(self.snapshot_name, {
+            'saved_at': time.time(),
+            'city': self.city_entry.get().strip(),
+            'current_weather': self.current_weather,
+            'forecast': self.forecast_data or None,
+            'daily': None if self.daily_data is self.forecast_data else self.daily_data,
+            'charts': {name: base64.b64encode(png).decode('ascii') for name, png in frames.items()}
+        })
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Advanced Weather Forecast Dashboard")
+    parser.add_argument('--cities', help="comma-separated cities to open in the multi-city dashboard")
+    parser.add_argument('--city-file', help="file with one city per line for the multi-city dashboard")
+    parser.add_argument('--live-window', type=int, default=50, help="points shown in the Live Data chart")
+    parser.add_argument('--live-interval', type=int, default=1000, help="milliseconds between Live Data ticks")
+    parser.add_argument('--perf', action='store_true', help="show the Performance tab with timing spans")
+    parser.add_argument('--provider', choices=PROVIDERS, default='auto', 
+                        help="weather API: One Call 3.0 with 2.5 fallback (auto), onecall or 2.5")
+    parser.add_argument('--kiosk', action='store_true', 
+                        help="full screen, auto-refreshing long-run mode with a memory watchdog")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    cities = []
+    if args.city_file:
+        cities.extend(load_city_list(args.city_file))
+    if args.cities:
+        cities.extend(c.strip() for c in args.cities.split(',') if c.strip() and c.strip() not in cities)
+    
+    if args.kiosk:
+        # Watchdog reports go to stderr, e.g. into the journal under systemd
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    
     root = tk.Tk()
-    app = AdvancedWeatherApp(root)
+    app = AdvancedWeatherApp(root, realtime_window=args.live_window,
+                             realtime_interval_ms=args.live_interval, show_performance=args.perf,
+                             provider=args.provider, kiosk=args.kiosk)
     
     # Set window icon and styling
     root.iconname("Weather App")
@@ -484,14 +1210,31 @@ def main():
     # Handle window closing
     def on_closing():
         app.animation_running = False
+        app.renderer.stop()
+        app.save_snapshot()
         if hasattr(app, 'refresh_job'):
             root.after_cancel(app.refresh_job)
+        if app.watchdog:
+            root.after_cancel(app.kiosk_job)
+            app.watchdog.stop()
+        app.refresh_executor.shutdown(wait=False)
+        app.batch_fetcher.shutdown()
+        app.client.close()
+        if app.history:
+            app.history.close()
         root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
     
-    # Start with a sample city
-    app.city_entry.insert(0, "London")
+    # Start with the last session's dashboard if there is one, otherwise a sample city
+    city = app.restore_snapshot()
+    app.city_entry.insert(0, city or "London")
+    if args.kiosk or city:
+        # In kiosk mode auto-refresh is on, so the first fetch schedules the following ones
+        app.get_weather()
+    
+    if cities:
+        app.open_multi_city_dashboard(cities)
     
     root.mainloop()
 
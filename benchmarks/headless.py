@@ -0,0 +1,90 @@
+"""The dashboard's charts without Tk, for the benchmarks and the soak test.
+
+Every chart from weather_charts is created as the dashboard creates it
+(animated artists on an Agg canvas) and updated and rendered by the
+dashboard's own ChartRenderer. Finished frames land in a FrameSink instead
+of being pasted into a Tk canvas, so no display is needed.
+"""
+import threading
+
+import matplotlib.dates as mdates
+import numpy as np
+
+from weather_analytics import derive_metrics
+from weather_charts import FORECAST_CHARTS, HistoryChart, LiveDataChart
+from weather_core import local_utc_offsets
+
+
+class FrameSink:
+    """Stands in for the Tk root that ChartRenderer hands its frames to; keeps the newest frame per chart
+
+    Frames are the renderer's reused buffers, overwritten by the chart's next render.
+    """
+
+    def __init__(self):
+        self.frames = {}
+
+    def after(self, delay, callback, *args):
+        callback(*args)
+
+    def paste(self, key, image):
+        self.frames[key] = image
+
+
+class HeadlessCharts:
+    """The dashboard's seven charts, updated the way its tabs are and rendered by its ChartRenderer"""
+
+    def __init__(self, dashboard, window=50, history_days=7):
+        self.realtime_data = {key: dashboard.RingBuffer(window) for key in ('time', 'temp', 'humidity')}
+        self.realtime_lock = threading.Lock()
+        self.sink = FrameSink()
+        self.renderer = dashboard.ChartRenderer(self.sink, self.sink.paste)
+        self.forecast_charts = [chart_class(animated=True) for chart_class in FORECAST_CHARTS.values()]
+        self.history_chart = HistoryChart(animated=True, days=history_days)
+        self.live_chart = LiveDataChart(animated=True, seconds=window)
+        for chart in self.forecast_charts + [self.history_chart, self.live_chart]:
+            self.renderer.add(chart.name, chart.name, chart.fig, chart.artists)
+
+    def update_forecast(self, forecast):
+        # As update_charts: one derive_metrics call, then every forecast chart updated on the render thread
+        derived = derive_metrics(forecast)
+        for chart in self.forecast_charts:
+            self.submit_forecast(chart, forecast, derived)
+
+    def submit_forecast(self, chart, forecast, derived):
+        def update():
+            if chart.update(forecast, derived):
+                self.renderer.invalidate(chart.name)
+        self.renderer.submit(chart.name, update)
+
+    def update_history(self, history):
+        if not history['dt'].size:
+            return
+        local_time = history['dt'] + local_utc_offsets(history['dt'])
+        times = mdates.date2num(local_time.astype('datetime64[s]'))
+        self.renderer.submit(self.history_chart.name, lambda: self.history_chart.update(times, history['temp']))
+
+    def tick(self, now):
+        """One Live Data tick: a simulated reading appended and the chart re-blitted"""
+        with self.realtime_lock:
+            self.realtime_data['time'].append(now)
+            self.realtime_data['temp'].append(20 + np.sin(now * 0.1) * 2)
+            self.realtime_data['humidity'].append(10 + np.cos(now * 0.15))
+        self.renderer.submit(self.live_chart.name, self.draw_realtime_data)
+
+    def draw_realtime_data(self):
+        # As the dashboard's: the render thread copies the ring buffers into the chart
+        with self.realtime_lock:
+            self.live_chart.update(self.realtime_data['time'].view(), self.realtime_data['temp'].view(),
+                                   self.realtime_data['humidity'].view())
+
+    def reset_realtime_data(self):
+        with self.realtime_lock:
+            for buffer in self.realtime_data.values():
+                buffer.clear()
+
+    def flush(self):
+        self.renderer.flush()
+
+    def close(self):
+        self.renderer.stop()
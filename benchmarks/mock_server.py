@@ -0,0 +1,192 @@
+"""Offline stand-in for the OpenWeatherMap API.
+
+Replays recorded 2.5 /weather and /forecast, One Call 3.0 and geocoding payloads with configurable latency,
+error and rate-limit responses, and serves placeholder condition icons, so the
+app and benchmarks run without an API key or network access:
+
+    python benchmarks/mock_server.py --port 8765 --latency 0.05
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8765/data/2.5 python weather.py fetch London
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def placeholder_png(code, size=100):
+    """Solid-colour PNG standing in for a condition icon, coloured by the icon code"""
+    colour = hashlib.sha1(code.encode('utf-8')).digest()[:3]
+    rows = b''.join(b'\x00' + colour * size for _ in range(size))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+class MockWeatherServer:
+    """Threaded HTTP server replaying recorded payloads"""
+
+    # Last path segment -> fixture name (direct is the geocoding endpoint)
+    ENDPOINTS = ('weather', 'forecast', 'onecall', 'direct')
+
+    def __init__(self, host='127.0.0.1', port=0, payload_dir=FIXTURE_DIR,
+                 latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, seed=None,
+                 onecall_enabled=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.onecall_enabled = onecall_enabled
+        self.random = random.Random(seed)
+        self.payloads = {}
+        for endpoint in self.ENDPOINTS:
+            with open(os.path.join(payload_dir, f'{endpoint}.json'), 'r', encoding='utf-8') as f:
+                self.payloads[endpoint] = json.load(f)
+        self.request_counts = {endpoint: 0 for endpoint in self.ENDPOINTS}
+        self.request_counts['icon'] = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/data/2.5"
+
+    def payload(self, endpoint, city):
+        """Recorded payload renamed to the requested city"""
+        data = copy.deepcopy(self.payloads[endpoint])
+        name = city.split(',')[0].strip().title() or data.get('name')
+        if endpoint == 'weather':
+            data['name'] = name
+        elif endpoint == 'forecast':
+            data['city']['name'] = name
+        elif endpoint == 'direct':
+            data[0]['name'] = name
+        return data
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, data, headers=None):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_icon(self, name):
+                with server._lock:
+                    server.request_counts['icon'] += 1
+                body = placeholder_png(name.split('@')[0])
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+                query = parse_qs(url.query)
+                if url.path.startswith('/img/wn/'):
+                    self.send_icon(endpoint)
+                    return
+                if endpoint not in server.payloads:
+                    self.send_json(404, {'cod': '404', 'message': 'Internal error'})
+                    return
+
+                with server._lock:
+                    server.request_counts[endpoint] += 1
+                    delay = server.latency + server.random.uniform(0, server.jitter)
+                    roll = server.random.random()
+                if delay:
+                    time.sleep(delay)
+
+                if endpoint == 'onecall' and not server.onecall_enabled:
+                    self.send_json(401, {'cod': 401, 'message': 'Please note that using One Call 3.0 requires '
+                                                                 'a separate subscription'})
+                    return
+                if roll < server.rate_limit_rate:
+                    self.send_json(429, {'cod': 429, 'message': 'Your account is temporary blocked'},
+                                   {'Retry-After': '60'})
+                    return
+                if roll < server.rate_limit_rate + server.error_rate:
+                    self.send_json(500, {'cod': '500', 'message': 'Internal server error'})
+                    return
+
+                city = query.get('q', ['London'])[0]
+                data = server.payload(endpoint, city)
+                etag = '"' + hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_json(200, data, {'ETag': etag})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OpenWeatherMap stand-in server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--payload-dir', default=FIXTURE_DIR,
+                        help="directory with weather.json, forecast.json, onecall.json and direct.json")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random seconds of latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of HTTP 500 responses")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="fraction of HTTP 429 responses")
+    parser.add_argument('--no-onecall', action='store_true',
+                        help="answer One Call requests with 401 like a key without a subscription")
+    args = parser.parse_args()
+
+    server = MockWeatherServer(args.host, args.port, args.payload_dir, args.latency, args.jitter,
+                               args.error_rate, args.rate_limit_rate, onecall_enabled=not args.no_onecall)
+    print(f"Serving mock OpenWeatherMap API at {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""End-to-end benchmarks against the offline mock server.
+
+Measures fetch latency (cold and cached), forecast parse/aggregation time,
+streaming versus whole-body ingestion of large forecasts, derived metrics for
+one and 200 cities, and the render time of update_charts and one Live Data
+tick (headless, with Agg). update_forecast_cards builds Tk widgets, so it
+only runs when a display is available (e.g. under xvfb-run). Results are
+written as JSON so runs can be compared between versions:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare results.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import MockWeatherServer  # noqa: E402
+from weather_core import WeatherClient, parse_forecast, read_forecast, summarize_daily_forecast  # noqa: E402
+from weather_analytics import derive_metrics, stack_forecasts, wind_rose  # noqa: E402
+from headless import HeadlessCharts  # noqa: E402
+from weather import load_dashboard  # noqa: E402
+
+
+def measure(func, repeat, warmup=1):
+    """Run func repeatedly and return timing statistics in milliseconds"""
+    for _ in range(warmup):
+        func()
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples[i] = (time.perf_counter() - start) * 1000
+    return {
+        'n': repeat,
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'min_ms': float(samples.min()),
+        'max_ms': float(samples.max())
+    }
+
+
+def long_forecast(forecast_list, copies):
+    """Tile the recorded forecast into a longer, evenly spaced series"""
+    step = forecast_list[1]['dt'] - forecast_list[0]['dt']
+    span = step * len(forecast_list)
+    return [dict(item, dt=item['dt'] + span * i) for i in range(copies) for item in forecast_list]
+
+
+def bench_fetch(server, repeat):
+    results = {}
+    # The 2.5 results keep their original names so older result files stay comparable
+    for provider, suffix in (('2.5', ''), ('onecall', '_onecall')):
+        client = WeatherClient(base_url=server.base_url, calls_per_minute=10 ** 6, provider=provider)
+        try:
+            def cold():
+                client.cache.clear()
+                for _ in client.fetch('London'):
+                    pass
+
+            def cached():
+                for _ in client.fetch('London'):
+                    pass
+
+            results[f'fetch_cold{suffix}'] = measure(cold, repeat)
+            results[f'fetch_cached{suffix}'] = measure(cached, repeat)
+        finally:
+            client.close()
+    return results
+
+
+def bench_parse(forecast_list, repeat):
+    results = {}
+    for label, copies in (('5d', 1), ('40d', 8)):
+        entries = long_forecast(forecast_list, copies)
+        results[f'parse_forecast_{label}'] = measure(lambda: parse_forecast(entries), repeat)
+        parsed = parse_forecast(entries)
+        results[f'summarize_daily_{label}'] = measure(lambda: summarize_daily_forecast(parsed, days=len(entries)), repeat)
+    return results
+
+
+def bench_analytics(forecast_list, repeat):
+    """Derived metrics and wind rose for one city, 200 cities in one batch and 200 one at a time"""
+    forecast = parse_forecast(forecast_list)
+    stacked = stack_forecasts([forecast] * 200)
+    
+    def analyze(data):
+        derive_metrics(data)
+        wind_rose(data['wind_deg'], data['wind_speed'])
+    
+    def per_city():
+        for _ in range(200):
+            analyze(forecast)
+    
+    return {
+        'analytics_1city': measure(lambda: analyze(forecast), repeat),
+        'analytics_200cities_batched': measure(lambda: analyze(stacked), repeat),
+        'analytics_200cities_loop': measure(per_city, repeat)
+    }
+
+
+def peak_memory_kb(func):
+    """Peak Python heap allocated while func runs"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def bench_ingest(forecast, repeat):
+    """Streamed read_forecast against json.loads + parse_forecast on the same body"""
+    results = {}
+    for label, copies in (('5d', 1), ('40d', 8), ('400d', 80)):
+        body = json.dumps(dict(forecast, list=long_forecast(forecast['list'], copies))).encode('utf-8')
+        
+        def streamed():
+            read_forecast(io.BytesIO(body))
+        
+        def whole():
+            parse_forecast(json.loads(body)['list'])
+        
+        for name, func in (('ingest_stream', streamed), ('ingest_json', whole)):
+            stats = measure(func, repeat)
+            stats['peak_kb'] = peak_memory_kb(func)
+            results[f'{name}_{label}'] = stats
+    return results
+
+
+def bench_charts(server, repeat):
+    """update_charts and one Live Data tick, rendered by the dashboard's ChartRenderer with Agg and no Tk
+
+    update_charts here redraws all five forecast charts, as if each tab were visible.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    charts = HeadlessCharts(load_dashboard())
+    forecast = parse_forecast(server.payload('forecast', 'London')['list'])
+    results = {}
+    try:
+        def update_charts():
+            charts.update_forecast(forecast)
+            charts.flush()
+
+        def realtime_tick():
+            charts.tick(time.time())
+            charts.flush()
+
+        results['update_charts'] = measure(update_charts, repeat)
+        results['realtime_tick'] = measure(realtime_tick, repeat * 5)
+    finally:
+        charts.close()
+    return results
+
+
+def bench_cards(server, repeat, directory):
+    """update_forecast_cards, the one benchmark that needs Tk widgets and so a display"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import tkinter as tk
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {'update_forecast_cards': {'skipped': f"no display available ({e})"}}
+    root.withdraw()
+
+    dashboard = load_dashboard()
+    # Icons are downloaded from the mock server as well; they, the snapshot and the history go to a
+    # scratch directory instead of the user's own
+    client = WeatherClient(base_url=server.base_url, calls_per_minute=10 ** 6)
+    app = dashboard.AdvancedWeatherApp(root, client=client, asset_dir=os.path.join(directory, 'assets'),
+                                       history_path=os.path.join(directory, 'history.sqlite3'))
+    app.animation_running = False
+    results = {}
+    try:
+        app.current_weather = server.payload('weather', 'London')
+        app.forecast_data = parse_forecast(server.payload('forecast', 'London')['list'])
+        # The cards are built from daily_data, which is the forecast itself for the 2.5 API
+        app.daily_data = app.forecast_data
+
+        def cards():
+            app.update_forecast_cards()
+            root.update_idletasks()
+
+        results['update_forecast_cards'] = measure(cards, repeat)
+    finally:
+        app.renderer.stop()
+        # Let the startup retention job on the client's pool finish before the store closes
+        app.client.executor.shutdown(wait=True)
+        app.client.close()
+        if app.history:
+            app.history.close()
+        root.destroy()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    print(f"\nCompared with {baseline_path}:")
+    for name, stats in results.items():
+        before = baseline.get(name, {})
+        if 'p50_ms' not in stats or 'p50_ms' not in before:
+            continue
+        change = (stats['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        print(f"  {name:28s} {before['p50_ms']:9.3f} -> {stats['p50_ms']:9.3f} ms  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weather app benchmarks")
+    parser.add_argument('--repeat', type=int, default=20, help="iterations per benchmark")
+    parser.add_argument('--latency', type=float, default=0.02, help="mock server latency in seconds")
+    parser.add_argument('--skip-render', action='store_true', help="skip the chart, Live Data and card render benchmarks")
+    parser.add_argument('--output', help="write results as JSON to this path")
+    parser.add_argument('--compare', help="previous JSON results to compare against")
+    args = parser.parse_args()
+
+    results = {}
+    with MockWeatherServer(latency=args.latency, seed=0) as server:
+        results.update(bench_fetch(server, args.repeat))
+        results.update(bench_parse(server.payloads['forecast']['list'], args.repeat))
+        results.update(bench_ingest(server.payloads['forecast'], args.repeat))
+        results.update(bench_analytics(server.payloads['forecast']['list'], args.repeat))
+        if not args.skip_render:
+            results.update(bench_charts(server, args.repeat))
+            with tempfile.TemporaryDirectory() as tmp:
+                results.update(bench_cards(server, args.repeat, tmp))
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'mock_latency_s': args.latency,
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+
+    for name, stats in results.items():
+        if 'skipped' in stats:
+            print(f"{name:30s} skipped: {stats['skipped']}")
+        else:
+            peak = f"   peak {stats['peak_kb']:9.1f} KiB" if 'peak_kb' in stats else ""
+            print(f"{name:30s} p50 {stats['p50_ms']:9.3f} ms   p95 {stats['p95_ms']:9.3f} ms{peak}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Long-run memory soak test against the offline mock server.
+
+Runs the Live Data loop (one tick per simulated second) and an auto-refresh
+every ten simulated minutes for the given number of simulated hours, as fast
+as possible, and samples RSS once per simulated hour. With a display (e.g.
+under xvfb-run) it drives the real dashboard. Without one (or with
+--headless) it runs the 'charts' loop: the same fetch, parse and history
+store work, with every chart from weather_charts rendered by the
+dashboard's ChartRenderer, but no Tk widgets, icons or snapshots. Its
+report says 'charts', never 'dashboard'.
+
+    python benchmarks/soak.py --hours 24 --output soak.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from headless import HeadlessCharts  # noqa: E402
+from mock_server import MockWeatherServer  # noqa: E402
+from weather import load_dashboard  # noqa: E402
+from weather_core import (  # noqa: E402
+    MemoryWatchdog, WeatherClient, WeatherHistoryStore, current_rss, metrics, parse_current_weather,
+    select_daily, summarize_daily_forecast
+)
+
+TICKS_PER_HOUR = 3600
+REFRESH_EVERY_TICKS = 600
+# Kiosk mode checks its memory watchdog every 10 minutes
+WATCHDOG_EVERY_TICKS = 600
+
+
+class ChartLoop:
+    """The dashboard's data and chart work without Tk widgets
+
+    Refreshes go through the client and history store as in the dashboard,
+    and every chart is updated and rendered by the dashboard's ChartRenderer
+    (see headless.HeadlessCharts).
+    """
+
+    def __init__(self, dashboard, base_url, history_path, city, history_days=7):
+        self.client = WeatherClient(base_url=base_url, calls_per_minute=10 ** 6)
+        self.history = WeatherHistoryStore(history_path)
+        self.city = city
+        self.history_days = history_days
+        self.charts = HeadlessCharts(dashboard, history_days=history_days)
+
+    def tick(self, now):
+        self.charts.tick(now)
+        self.charts.flush()
+
+    def refresh(self):
+        # Drop the cache so every refresh downloads and parses the payloads again
+        self.client.cache.clear()
+        for endpoint, status, data in self.client.fetch(self.city):
+            if status != 200:
+                continue
+            if endpoint == 'weather':
+                parse_current_weather(data)
+                self.history.record_observation(data)
+                self.charts.update_history(self.history.observations(
+                    self.history.city_key(data['name'], data['sys']['country']),
+                    since=time.time() - self.history_days * 86400))
+            else:
+                summarize_daily_forecast(select_daily(data))
+                self.history.record_forecast(data['city'], data['forecast'])
+                self.charts.update_forecast(data['forecast'])
+        self.charts.flush()
+
+    def add_resets(self, watchdog):
+        # What kiosk mode lets its watchdog drop, minus the Tk-only asset cache
+        watchdog.add_reset("response cache", self.client.cache.clear)
+        watchdog.add_reset("metrics", metrics.reset)
+        watchdog.add_reset("live data", self.charts.reset_realtime_data)
+        watchdog.add_reset("chart backgrounds", self.charts.renderer.reset)
+
+    def close(self):
+        self.charts.close()
+        self.client.close()
+        self.history.close()
+
+
+class DashboardLoop:
+    """The real dashboard on a withdrawn Tk root, pumped by hand instead of by mainloop"""
+
+    def __init__(self, dashboard, root, base_url, history_path, asset_dir, city):
+        self.root = root
+        # The client, icons and history all stay away from the user's real asset folder and history
+        client = WeatherClient(base_url=base_url, calls_per_minute=10 ** 6)
+        self.app = dashboard.AdvancedWeatherApp(root, client=client, asset_dir=asset_dir, history_path=history_path)
+        self.app.animation_running = False
+        self.app.notebook.select(self.app.realtime_frame)
+        self.app.show_first_chart()
+        self.city = city
+
+    def tick(self, now):
+        self.app.update_realtime_data()
+        self.app.renderer.flush()
+        self.root.update()
+
+    def refresh(self):
+        self.app.client.cache.clear()
+        self.app.fetch_weather_data(self.city)
+        self.app.renderer.flush()
+        self.root.update()
+
+    def add_resets(self, watchdog):
+        self.app.add_watchdog_resets(watchdog)
+
+    def close(self):
+        self.app.renderer.stop()
+        self.app.refresh_executor.shutdown(wait=True)
+        # The startup retention job runs on the client's pool; let it finish before the store closes
+        self.app.client.executor.shutdown(wait=True)
+        self.app.client.close()
+        self.app.history.close()
+        self.root.destroy()
+
+
+def create_loop(args, base_url, directory):
+    # History and assets live in a scratch directory, never the user's own
+    history_path = os.path.join(directory, 'history.sqlite3')
+    dashboard = load_dashboard()
+    if not args.headless:
+        import matplotlib
+        matplotlib.use('Agg')
+        import tkinter as tk
+        try:
+            root = tk.Tk()
+        except tk.TclError as e:
+            print(f"No display available ({e}): soaking the charts and data path without the Tk dashboard")
+        else:
+            root.withdraw()
+            return 'dashboard', DashboardLoop(dashboard, root, base_url, history_path,
+                                               os.path.join(directory, 'assets'), args.city)
+    return 'charts', ChartLoop(dashboard, base_url, history_path, args.city)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weather app long-run memory soak test")
+    parser.add_argument('--hours', type=float, default=24, help="simulated hours to run")
+    parser.add_argument('--city', default='London')
+    parser.add_argument('--headless', action='store_true', help="skip the Tk dashboard even with a display")
+    parser.add_argument('--trace', action='store_true', help="also track allocations with tracemalloc")
+    parser.add_argument('--max-growth-mb', type=float, default=8.0,
+                        help="fail when RSS grows more than this after the first simulated hour")
+    parser.add_argument('--watchdog-mb', type=float, default=64,
+                        help="kiosk memory watchdog budget; the run fails if the watchdog ever resets anything")
+    parser.add_argument('--output', help="write the RSS samples as JSON to this path")
+    args = parser.parse_args()
+
+    ticks = int(args.hours * TICKS_PER_HOUR)
+    samples = []
+    # The kiosk watchdog with its real budget and resets; as in kiosk mode its baseline is the
+    # first check after the first refresh, so warm-up never counts as growth
+    watchdog = MemoryWatchdog(growth_limit_mb=args.watchdog_mb, trace=args.trace)
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp, MockWeatherServer(seed=0) as server:
+        mode, loop = create_loop(args, server.base_url, tmp)
+        loop.add_resets(watchdog)
+        try:
+            for tick in range(ticks):
+                if tick % REFRESH_EVERY_TICKS == 0:
+                    loop.refresh()
+                loop.tick(time.time())
+                if (tick + 1) % TICKS_PER_HOUR == 0:
+                    gc.collect()
+                if (tick + 1) % WATCHDOG_EVERY_TICKS == 0:
+                    watchdog.check()
+                if (tick + 1) % TICKS_PER_HOUR == 0:
+                    _, rss, traced = watchdog.samples[-1]
+                    samples.append({'hour': (tick + 1) // TICKS_PER_HOUR, 'rss_mb': rss / 1048576,
+                                    'traced_mb': None if traced is None else traced / 1048576})
+                    print(f"hour {samples[-1]['hour']:3d}  RSS {samples[-1]['rss_mb']:7.1f} MB")
+        finally:
+            loop.close()
+            watchdog.stop()
+
+    # The first hour covers imports, caches and pools warming up
+    steady = [sample['rss_mb'] for sample in samples[1:]] or [sample['rss_mb'] for sample in samples]
+    growth = steady[-1] - steady[0] if steady else 0.0
+    report = {
+        'meta': {'mode': mode, 'simulated_hours': args.hours, 'ticks': ticks,
+                 'wall_seconds': time.perf_counter() - start, 'final_rss_mb': current_rss() / 1048576},
+        'growth_mb': growth,
+        'watchdog': {'budget_mb': args.watchdog_mb, 'resets': watchdog.reset_count},
+        'samples': samples,
+        'spans': metrics.summary()
+    }
+    print(f"{mode} loop: {ticks} ticks in {report['meta']['wall_seconds']:.1f} s, "
+          f"steady-state RSS growth {growth:+.2f} MB, {watchdog.reset_count} watchdog resets")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0 if growth <= args.max_growth_mb and not watchdog.reset_count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
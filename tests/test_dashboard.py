@@ -0,0 +1,209 @@
+"""Dashboard pieces that can run without a display, against the offline mock server.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from mock_server import MockWeatherServer  # noqa: E402
+from weather import load_dashboard  # noqa: E402
+from weather_core import AssetCache, MemoryWatchdog, RefreshScheduler, WeatherClient  # noqa: E402
+
+
+class FakeRoot:
+    """Collects the callbacks the dashboard posts to Tk, with their delays in milliseconds"""
+
+    def __init__(self):
+        self.calls = {}
+        self._next_id = 0
+
+    def after(self, delay, callback, *args):
+        self._next_id += 1
+        self.calls[self._next_id] = (delay, callback, args)
+        return self._next_id
+
+    def after_cancel(self, job):
+        del self.calls[job]
+
+
+class Value:
+    """Stands in for a Tk variable or Entry: get() returns whatever was set"""
+
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """A scratch home directory, so the dashboard's default paths point inside it"""
+    path = tmp_path / 'home'
+    path.mkdir()
+    monkeypatch.setenv('HOME', str(path))
+    return path
+
+
+@pytest.fixture
+def server():
+    with MockWeatherServer(seed=0) as server:
+        yield server
+
+
+def test_icon_names_depend_on_the_icon_server(server):
+    real = WeatherClient()
+    mock = WeatherClient(base_url=server.base_url)
+    try:
+        assert real.icon_asset_name('10d') != mock.icon_asset_name('10d')
+        assert real.icon_asset_name('10d') == WeatherClient().icon_asset_name('10d')
+    finally:
+        real.close()
+        mock.close()
+
+
+def test_mock_icons_never_reach_the_real_icon_names(home, tmp_path, server):
+    dashboard = load_dashboard()
+    assets = AssetCache(str(tmp_path / 'assets'))
+    mock = WeatherClient(base_url=server.base_url)
+    real = WeatherClient()
+    try:
+        icons = dashboard.IconCache(FakeRoot(), mock, assets)
+        icons.load('10d')
+        assert server.request_counts['icon'] == 1
+        assert assets.read(mock.icon_asset_name('10d'))
+        # Even sharing a folder, a later launch against the real API does not pick up the placeholder
+        assert assets.read(real.icon_asset_name('10d')) is None
+    finally:
+        mock.close()
+        real.close()
+    assert not os.path.exists(dashboard.DEFAULT_ASSET_DIR)
+
+
+def test_mock_pointed_dashboard_keeps_out_of_the_default_folders(home, tmp_path, server):
+    dashboard = load_dashboard()
+    try:
+        root = dashboard.tk.Tk()
+    except dashboard.tk.TclError as e:
+        pytest.skip(f"no display available ({e})")
+    root.withdraw()
+    client = WeatherClient(base_url=server.base_url, calls_per_minute=10 ** 6)
+    app = dashboard.AdvancedWeatherApp(root, client=client, asset_dir=str(tmp_path / 'assets'),
+                                       history_path=str(tmp_path / 'history.sqlite3'))
+    try:
+        app.fetch_weather_data('London')
+        app.renderer.flush()
+        root.update()
+        app.save_snapshot()
+    finally:
+        app.renderer.stop()
+        app.refresh_executor.shutdown(wait=True)
+        client.executor.shutdown(wait=True)
+        client.close()
+        app.history.close()
+        root.destroy()
+    assert not os.path.exists(dashboard.DEFAULT_ASSET_DIR)
+    assert not os.path.exists(dashboard.DEFAULT_HISTORY_PATH)
+    assert os.listdir(tmp_path / 'assets')
+
+
+@pytest.fixture
+def refresh_app():
+    """Just the parts of AdvancedWeatherApp that auto-refresh scheduling uses, without Tk"""
+    dashboard = load_dashboard()
+    app = dashboard.AdvancedWeatherApp.__new__(dashboard.AdvancedWeatherApp)
+    app.root = FakeRoot()
+    app.auto_refresh = Value(True)
+    app.city_entry = Value('London')
+    app.status_var = Value()
+    app.scheduler = RefreshScheduler(min_interval=30, update_interval=600)
+    return app
+
+
+def scheduled_delays(app):
+    return [delay for delay, callback, args in app.root.calls.values() if callback == app.auto_refresh_tick]
+
+
+def test_completion_schedules_the_next_refresh(refresh_app):
+    now = time.time()
+    assert refresh_app.scheduler.begin('London')
+    refresh_app.scheduler.succeed('London', observed_at=now, now=now)
+    refresh_app.on_fetch_complete('London', "Updated London")
+    [delay] = scheduled_delays(refresh_app)
+    assert 590 * 1000 <= delay <= 600 * 1000
+    assert refresh_app.status_var.get().startswith("Updated London - ")
+
+
+def test_completion_reschedules_when_the_entry_changed_mid_fetch(refresh_app):
+    now = time.time()
+    refresh_app.scheduler.begin('Paris')
+    refresh_app.scheduler.succeed('Paris', observed_at=now - 300, now=now)
+    assert refresh_app.scheduler.begin('London')
+    refresh_app.city_entry.set('Paris')
+    refresh_app.scheduler.succeed('London', observed_at=now, now=now)
+    refresh_app.on_fetch_complete('London', "Updated London")
+    # Timed for the city now in the entry, not the one that just finished
+    [delay] = scheduled_delays(refresh_app)
+    assert 290 * 1000 <= delay <= 300 * 1000
+    assert refresh_app.status_var.get() == "Updated London"
+
+
+def test_completion_with_an_empty_entry_polls_again_after_min_interval(refresh_app):
+    refresh_app.scheduler.begin('London')
+    refresh_app.city_entry.set('')
+    refresh_app.scheduler.fail('London', status=500)
+    refresh_app.on_fetch_complete('London', "Error")
+    assert scheduled_delays(refresh_app) == [30 * 1000]
+
+
+def test_failed_refreshes_back_off_and_only_one_tick_stays_scheduled(refresh_app):
+    delays = []
+    for _ in range(4):
+        assert refresh_app.scheduler.begin('London')
+        refresh_app.scheduler.fail('London', status=None)
+        refresh_app.on_fetch_complete('London', "Network error")
+        delays.extend(scheduled_delays(refresh_app))
+        assert len(scheduled_delays(refresh_app)) == 1
+    # Jittered exponential backoff: each delay lies in [base * 2**n / 2, base * 2**n]
+    for n, delay in enumerate(delays):
+        assert 30 * 2 ** n * 1000 / 2 - 1000 <= delay <= 30 * 2 ** n * 1000
+
+
+def test_no_refresh_is_scheduled_with_auto_refresh_off(refresh_app):
+    refresh_app.auto_refresh.set(False)
+    refresh_app.scheduler.begin('London')
+    refresh_app.scheduler.succeed('London')
+    refresh_app.on_fetch_complete('London', "Updated London")
+    assert scheduled_delays(refresh_app) == []
+
+
+def test_kiosk_watchdog_baseline_waits_for_the_first_successful_refresh(refresh_app, server):
+    refresh_app.client = WeatherClient(base_url=server.base_url, calls_per_minute=10 ** 6)
+    refresh_app.history = None
+    refresh_app.current_weather = {}
+    refresh_app.warmed_up = False
+    refresh_app.watchdog = MemoryWatchdog(growth_limit_mb=64)
+    refresh_app.watchdog_interval_ms = 600 * 1000
+    try:
+        refresh_app.kiosk_tick()
+        assert refresh_app.watchdog.baseline_rss is None and not refresh_app.watchdog.samples
+
+        refresh_app.scheduler.begin('London')
+        refresh_app.fetch_weather_data('London')
+        assert refresh_app.warmed_up
+        refresh_app.kiosk_tick()
+        assert refresh_app.watchdog.baseline_rss is not None
+        assert refresh_app.watchdog.reset_count == 0
+    finally:
+        refresh_app.client.close()
+        refresh_app.watchdog.stop()
@@ -0,0 +1,91 @@
+"""Reference values for the derived weather metrics in weather_analytics.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from weather_analytics import (  # noqa: E402
+    derive_metrics, dew_point, feels_like, heat_index, rolling_mean, rolling_slope, stack_forecasts, trend_slope,
+    wind_chill, wind_rose
+)
+
+
+def test_heat_index_matches_nws_table():
+    # NWS table: 90 °F at 70 % RH reads 106 °F
+    assert heat_index(32, 70) == pytest.approx(40.4, abs=0.1)
+
+
+def test_heat_index_below_80f_uses_simple_formula():
+    assert heat_index(20, 50) == pytest.approx(19.6, abs=0.3)
+
+
+def test_wind_chill_matches_environment_canada_table():
+    # -10 °C with a 20 km/h wind; wind speed is in m/s
+    assert wind_chill(-10, 20 / 3.6) == pytest.approx(-17.9, abs=0.1)
+
+
+def test_wind_chill_only_applies_in_cold_wind():
+    assert wind_chill(15, 10) == pytest.approx(15)
+    assert wind_chill(-5, 1) == pytest.approx(-5)
+
+
+def test_dew_point():
+    assert dew_point(20, 50) == pytest.approx(9.3, abs=0.1)
+    assert dew_point(25, 100) == pytest.approx(25)
+
+
+def test_feels_like_picks_heat_index_or_wind_chill():
+    assert feels_like(32, 70, 1) == pytest.approx(heat_index(32, 70))
+    assert feels_like(-10, 60, 20 / 3.6) == pytest.approx(wind_chill(-10, 20 / 3.6))
+
+
+def test_rolling_slope_of_a_line():
+    hours = np.arange(48.0)
+    slope = rolling_slope(hours, 2 * hours + 5, 24)
+    assert np.isnan(slope[:23]).all()
+    assert slope[23:] == pytest.approx(2)
+
+
+def test_rolling_mean_of_a_constant():
+    assert rolling_mean(np.full(10, 4.0), 3) == pytest.approx(4)
+
+
+def test_trend_slope_ignores_nan_padding():
+    hours = np.arange(10.0)
+    stacked = stack_forecasts([{'dt': hours, 'temp': 3 * hours}, {'dt': hours[:6], 'temp': -hours[:6]}],
+                              fields=('temp',))
+    assert trend_slope(stacked['dt'], stacked['temp']) == pytest.approx([3, -1])
+
+
+def test_wind_rose_sectors_and_speed_bins():
+    rose = wind_rose([0, 90, 180, 270], [1, 3, 5, 11])
+    assert rose.shape == (16, 6)
+    assert rose.sum() == pytest.approx(100)
+    # North, east, south and west land in sectors 0, 4, 8 and 12, one speed bin each
+    assert [tuple(index) for index in np.argwhere(rose)] == [(0, 0), (4, 1), (8, 2), (12, 5)]
+
+
+def test_wind_rose_north_sector_wraps_around():
+    rose = wind_rose([355, 5, 10, 350], [1, 1, 1, 1])
+    assert rose[0, 0] == pytest.approx(100)
+
+
+def test_derive_metrics_batched_matches_single_city():
+    dt = np.arange(40) * 3 * 3600
+    forecasts = [
+        {'dt': dt, 'temp': 10 + np.sin(dt / 20000), 'humidity': np.full(40, 60.0), 'wind_speed': np.full(40, 3.0),
+         'wind_deg': np.zeros(40)},
+        {'dt': dt, 'temp': 30 + np.cos(dt / 30000), 'humidity': np.full(40, 80.0), 'wind_speed': np.full(40, 1.0),
+         'wind_deg': np.zeros(40)}
+    ]
+    batched = derive_metrics(stack_forecasts(forecasts))
+    for row, forecast in enumerate(forecasts):
+        single = derive_metrics(forecast)
+        for key in ('dew_point', 'heat_index', 'wind_chill', 'temp_mean', 'temp_trend'):
+            np.testing.assert_allclose(batched[key][row], single[key], equal_nan=True)
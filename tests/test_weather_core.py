@@ -0,0 +1,287 @@
+"""Client, cache, scheduling and history behaviour against the offline mock server.
+
+    python -m pytest tests
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from mock_server import MockWeatherServer  # noqa: E402
+from weather_core import (  # noqa: E402
+    BatchWeatherFetcher, FallbackProvider, RateLimiter, RefreshScheduler, ResponseCache, WeatherClient,
+    WeatherHistoryStore, ijson, read_forecast, read_onecall
+)
+
+
+def fixture_bytes(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def assert_same_columns(streamed, whole):
+    assert streamed.keys() == whole.keys()
+    for field, values in whole.items():
+        if values.dtype == object:
+            assert list(streamed[field]) == list(values), field
+        else:
+            assert streamed[field].dtype == values.dtype, field
+            np.testing.assert_array_equal(streamed[field], values, err_msg=field)
+
+
+@pytest.fixture
+def server():
+    with MockWeatherServer(seed=0) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    client = WeatherClient(base_url=server.base_url, calls_per_minute=10 ** 6, provider='2.5')
+    yield client
+    client.close()
+
+
+@pytest.mark.skipif(ijson is None, reason="ijson is not installed")
+def test_streamed_forecast_matches_json():
+    body = fixture_bytes('forecast.json')
+    streamed = read_forecast(io.BytesIO(body), stream=True)
+    whole = read_forecast(io.BytesIO(body), stream=False)
+    assert streamed['city'] == whole['city']
+    assert whole['forecast']['dt'].size == len(json.loads(body)['list'])
+    assert_same_columns(streamed['forecast'], whole['forecast'])
+
+
+@pytest.mark.skipif(ijson is None, reason="ijson is not installed")
+def test_streamed_onecall_matches_json():
+    body = fixture_bytes('onecall.json')
+    streamed = read_onecall(io.BytesIO(body), stream=True)
+    whole = read_onecall(io.BytesIO(body), stream=False)
+    assert streamed['current'] == whole['current']
+    assert_same_columns(streamed['forecast'], whole['forecast'])
+    assert_same_columns(streamed['daily'], whole['daily'])
+
+
+class Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def test_only_large_or_unsized_bodies_are_streamed(client):
+    assert not client.should_stream(Response({'Content-Length': '17000'}))
+    assert client.should_stream(Response({'Content-Length': str(client.STREAM_MIN_BYTES)}))
+    assert client.should_stream(Response({}))
+
+
+def test_forecast_requests_decode_small_bodies_whole(client):
+    calls = []
+
+    def reader(fp, stream=True):
+        calls.append(stream)
+        return read_forecast(fp, stream)
+
+    status, data = client.request_endpoint('forecast', 'London', reader)
+    assert status == 200 and data['forecast']['dt'].size
+    assert calls == [False]
+
+
+def test_rate_limiter_keeps_every_window_within_the_limit():
+    limiter = RateLimiter(calls_per_minute=5, window=0.3)
+    calls = []
+    for _ in range(12):
+        limiter.acquire()
+        calls.append(time.monotonic())
+    # The first burst goes straight through, the sixth call waits for the first to leave the window
+    assert calls[4] - calls[0] < 0.1
+    assert calls[5] - calls[0] >= 0.3
+    for i, start in enumerate(calls):
+        assert sum(1 for t in calls[i:] if t - start < 0.3) <= 5
+
+
+def test_batch_fetcher_skips_cities_already_in_flight():
+    started, release = threading.Event(), threading.Event()
+    fetched, results = [], []
+
+    def fetch_city(city):
+        fetched.append(city)
+        started.set()
+        release.wait(5)
+        return {'city': city}
+
+    fetcher = BatchWeatherFetcher(fetch_city, max_workers=2)
+    try:
+        fetcher.submit(['London'], lambda *result: results.append(result))
+        assert started.wait(5)
+        fetcher.submit(['London', 'London'], lambda *result: results.append(result))
+        release.set()
+    finally:
+        fetcher.executor.shutdown(wait=True)
+    assert fetched == ['London']
+    assert results == [('London', {'city': 'London'}, None)]
+
+
+def test_scheduler_allows_one_request_in_flight_per_city():
+    scheduler = RefreshScheduler()
+    assert scheduler.begin('London')
+    assert not scheduler.begin(' london ')
+    assert scheduler.begin('Paris')
+    scheduler.succeed('London')
+    assert scheduler.begin('London')
+
+
+def test_scheduler_polls_when_upstream_data_can_have_changed():
+    scheduler = RefreshScheduler(min_interval=30, max_interval=3600, update_interval=600)
+    assert scheduler.succeed('London', observed_at=1000, now=1100) == 500
+    assert scheduler.succeed('London', observed_at=1000, expires_at=1900, now=1100) == 800
+    assert scheduler.succeed('London', observed_at=0, now=1100) == 30
+    assert scheduler.succeed('London', expires_at=10000, now=1100) == 3600
+
+
+def test_scheduler_backs_off_exponentially_and_harder_on_429():
+    scheduler = RefreshScheduler(backoff_base=30, max_backoff=1800)
+    for n in range(8):
+        delay = scheduler.fail('London', status=500, now=0)
+        limit = min(1800, 30 * 2 ** n)
+        assert limit / 2 <= delay <= limit
+        assert scheduler.delay('London', now=0) == delay
+    assert 60 <= scheduler.fail('Paris', status=429, now=0) <= 120
+    # A success starts the backoff over
+    scheduler.succeed('London', now=0)
+    assert 15 <= scheduler.fail('London', status=500, now=0) <= 30
+
+
+def test_cache_entries_go_stale_after_their_ttl():
+    cache = ResponseCache(ttls={'weather': 60})
+    cache.store('weather', 'London', {'temp': 14})
+    entry, fresh = cache.lookup('weather', ' LONDON')
+    assert fresh and entry['data'] == {'temp': 14}
+    entry['fetched_at'] -= 61
+    entry, fresh = cache.lookup('weather', 'London')
+    assert entry['data'] == {'temp': 14} and not fresh
+    assert cache.lookup('forecast', 'London') == (None, False)
+
+
+def test_cache_evicts_the_least_recently_used_entry():
+    cache = ResponseCache(max_entries=2)
+    cache.store('weather', 'London', 1)
+    cache.store('weather', 'Paris', 2)
+    cache.lookup('weather', 'London')
+    cache.store('weather', 'Berlin', 3)
+    assert cache.lookup('weather', 'Paris') == (None, False)
+    assert cache.lookup('weather', 'London')[0]['data'] == 1
+    assert cache.lookup('weather', 'Berlin')[0]['data'] == 3
+
+
+def test_stale_entries_are_revalidated_with_their_etag(server, client):
+    status, first = client.request_endpoint('weather', 'London')
+    assert status == 200 and client.cache.lookup('weather', 'London')[0]['etag']
+    assert client.request_endpoint('weather', 'London')[1] is first
+    assert server.request_counts['weather'] == 1
+
+    client.cache.ttls['weather'] = 0
+    status, second = client.request_endpoint('weather', 'London')
+    # 304 Not Modified: the cached body is kept and its age reset
+    assert status == 200 and second is first
+    assert server.request_counts['weather'] == 2
+    assert time.time() - client.cache.lookup('weather', 'London')[0]['fetched_at'] < 5
+
+
+def observation(server, dt, temp):
+    data = server.payload('weather', 'London')
+    data['dt'] = dt
+    data['main']['temp'] = temp
+    return data
+
+
+def test_retention_downsamples_old_observations_to_hourly_means(server, tmp_path):
+    store = WeatherHistoryStore(str(tmp_path / 'history.sqlite3'), retention_days=90, downsample_after_days=7)
+    now = 100 * 86400
+    old_hour = now - 10 * 86400
+    recent_hour = now - 86400
+    try:
+        store.record_observation(observation(server, now - 91 * 86400, 0))
+        for minute, temp in enumerate((10, 12, 14)):
+            store.record_observation(observation(server, old_hour + minute * 600, temp))
+            store.record_observation(observation(server, recent_hour + minute * 600, temp))
+        store.apply_retention(now=now)
+
+        history = store.observations('London,GB', until=now)
+        assert history['dt'].tolist() == [old_hour, recent_hour, recent_hour + 600, recent_hour + 1200]
+        assert history['temp'].tolist() == [12, 10, 12, 14]
+        # Already downsampled hours are left alone on the next pass
+        store.apply_retention(now=now)
+        assert store.observations('London,GB', until=now)['dt'].size == 4
+    finally:
+        store.close()
+
+
+class Provider:
+    """Stub provider answering every city with one status"""
+
+    endpoints = ('weather',)
+
+    def __init__(self, name, status):
+        self.name = name
+        self.status = status
+        self.calls = 0
+
+    def fetch(self, city):
+        self.calls += 1
+        yield 'weather', self.status, None
+        yield 'forecast', self.status, None
+
+
+@pytest.mark.parametrize('status', [401, 403])
+def test_fallback_when_the_key_is_refused(status):
+    primary, fallback = Provider('onecall', status), Provider('2.5', 200)
+    provider = FallbackProvider(primary, fallback)
+    assert [result[1] for result in provider.fetch('London')] == [200, 200]
+    assert list(provider.fetch('Paris'))
+    # Once refused, One Call is not asked again
+    assert (primary.calls, fallback.calls) == (1, 2)
+    assert provider.name == '2.5'
+
+
+@pytest.mark.parametrize('status', [404, 429, 500])
+def test_no_fallback_on_other_errors(status):
+    primary, fallback = Provider('onecall', status), Provider('2.5', 200)
+    provider = FallbackProvider(primary, fallback)
+    assert [result[1] for result in provider.fetch('London')] == [status, status]
+    assert (primary.calls, fallback.calls) == (1, 0)
+    assert provider.primary_enabled
+
+
+def test_client_falls_back_to_the_25_api_without_a_one_call_subscription():
+    with MockWeatherServer(seed=0, onecall_enabled=False) as server:
+        client = WeatherClient(base_url=server.base_url, calls_per_minute=10 ** 6)
+        try:
+            for city in ('London', 'Paris'):
+                summary = client.fetch_city_summary(city)
+                assert summary['error'] is None and summary['current']['city'] == city
+        finally:
+            client.close()
+    assert client.provider.name == '2.5'
+    assert server.request_counts['onecall'] == 1
+    assert (server.request_counts['weather'], server.request_counts['forecast']) == (2, 2)
+
+
+def test_client_reports_rate_limiting_without_trying_the_25_api():
+    with MockWeatherServer(seed=0, rate_limit_rate=1.0) as server:
+        client = WeatherClient(base_url=server.base_url, calls_per_minute=10 ** 6)
+        try:
+            summary = client.fetch_city_summary('London')
+        finally:
+            client.close()
+    assert summary['current'] is None and summary['error']
+    assert client.provider.primary_enabled
+    assert (server.request_counts['weather'], server.request_counts['forecast']) == (0, 0)
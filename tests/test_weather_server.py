@@ -0,0 +1,82 @@
+"""The serve command's HTTP front end against the offline mock server.
+
+    python -m pytest tests
+"""
+import asyncio
+import os
+import re
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from mock_server import MockWeatherServer  # noqa: E402
+from weather_core import WeatherClient  # noqa: E402
+from weather_server import WeatherServer  # noqa: E402
+
+
+@pytest.fixture
+def upstream():
+    # Slow enough upstream that concurrent requests overlap the first fetch
+    with MockWeatherServer(latency=0.3, seed=0) as server:
+        yield server
+
+
+@pytest.fixture
+def server(upstream):
+    client = WeatherClient(base_url=upstream.base_url, calls_per_minute=10 ** 6, provider='2.5')
+    server = WeatherServer(client, port=0)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result(5)
+    yield server
+    loop.call_soon_threadsafe(server.close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+    client.close()
+
+
+def test_concurrent_requests_share_one_upstream_fetch(upstream, server):
+    url = f"http://127.0.0.1:{server.port}/current?city=London"
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        responses = list(executor.map(lambda _: requests.get(url, timeout=10), range(10)))
+    assert {response.status_code for response in responses} == {200}
+    assert {response.json()['city'] for response in responses} == {'London'}
+    assert (upstream.request_counts['weather'], upstream.request_counts['forecast']) == (1, 1)
+    assert server.stats['fetches'] == 1
+    assert server.stats['coalesced'] == 9
+
+
+def exchange(port, data):
+    """Send raw bytes and return the status lines of every response until the server hangs up"""
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        sock.sendall(data)
+        received = b''
+        while chunk := sock.recv(65536):
+            received += chunk
+    return re.findall(rb'HTTP/1\.1 [^\r]*', received)
+
+
+@pytest.mark.parametrize('request_bytes', [
+    b'POST /health HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello',
+    b'GET /health HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc',
+    b'GET /health HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabc\r\n0\r\n\r\n'
+])
+def test_requests_with_a_body_close_the_connection(server, request_bytes):
+    # The unread body must not be parsed as the next request
+    assert exchange(server.port, request_bytes + b'GET /health HTTP/1.1\r\n\r\n') == [
+        b'HTTP/1.1 405 Method Not Allowed' if request_bytes.startswith(b'POST') else b'HTTP/1.1 200 OK']
+
+
+def test_plain_requests_keep_the_connection_open(server):
+    assert exchange(server.port, b'GET /health HTTP/1.1\r\n\r\n'
+                                 b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n') == [b'HTTP/1.1 200 OK'] * 2
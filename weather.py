@@ -0,0 +1,196 @@
+"""Command-line entry point for the weather app.
+
+    python weather.py fetch London --json
+    python weather.py history "London,GB" --days 7
+    python weather.py dashboard --cities "London,Paris"
+    python weather.py serve --port 8080
+
+Only the dashboard command imports Tk and the GUI module, and only dashboard
+and serve import matplotlib, so the other commands run quickly and without a
+display.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import runpy
+import sys
+import time
+
+import requests
+
+from weather_core import (
+    PROVIDERS, WeatherClient, WeatherHistoryStore, daily_to_json, describe_status, metrics,
+    parse_current_weather, select_daily, summarize_daily_forecast
+)
+
+DASHBOARD_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Advance_weather application.py")
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser('~'), '.weather_history.sqlite3')
+
+
+def load_dashboard():
+    """Import the GUI module, whose file name is not a module name, without running its main()"""
+    spec = importlib.util.spec_from_file_location('weather_dashboard', DASHBOARD_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def print_metrics(fmt):
+    if fmt == 'json':
+        print(metrics.to_json(), file=sys.stderr)
+    elif fmt == 'prometheus':
+        print(metrics.to_prometheus(), end='', file=sys.stderr)
+
+
+def cmd_fetch(args):
+    client = WeatherClient(args.api_key, cache_dir=args.cache_dir, provider=args.provider)
+    history = WeatherHistoryStore(args.history) if args.history else None
+    result = {'current': None, 'daily': []}
+    try:
+        statuses = {}
+        for endpoint, status, data in client.fetch(args.city):
+            statuses[endpoint] = status
+            if status != 200:
+                continue
+            if endpoint == 'weather':
+                result['current'] = parse_current_weather(data)
+                if history:
+                    history.record_observation(data)
+            else:
+                result['daily'] = daily_to_json(summarize_daily_forecast(select_daily(data), days=args.days))
+                if history:
+                    history.record_forecast(data['city'], data['forecast'])
+    except requests.exceptions.RequestException as e:
+        print(f"Network error: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+        if history:
+            history.close()
+        print_metrics(args.metrics)
+
+    if statuses['weather'] != 200:
+        print(describe_status(statuses['weather'], args.city), file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    current = result['current']
+    print(f"{current['city']}, {current['country']}: {current['temp']:.1f}°C, {current['description']}")
+    print(f"  Feels like {current['feels_like']:.1f}°C, humidity {current['humidity']}%, "
+          f"pressure {current['pressure']} hPa, wind {current['wind_speed']} m/s at {current['wind_deg']}°")
+    for day in result['daily']:
+        print(f"  {day['date']}  {day['high']:5.1f} / {day['low']:5.1f}°C  {day['description']}")
+    if statuses['forecast'] != 200:
+        print("Error fetching forecast data", file=sys.stderr)
+    return 0
+
+
+def cmd_history(args):
+    store = WeatherHistoryStore(args.history)
+    try:
+        observations = store.observations(args.city, since=time.time() - args.days * 86400)
+    finally:
+        store.close()
+
+    rows = [dict(zip(observations, values)) for values in zip(*(v.tolist() for v in observations.values()))]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for row in rows:
+            stamp = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['dt']))
+            print(f"{stamp}  {row['temp']:5.1f}°C  {row['humidity']:3.0f}%  {row['pressure']:.0f} hPa")
+    return 0
+
+
+def cmd_serve(args):
+    # asyncio and matplotlib are only needed by the server, so fetch and history never load them
+    import asyncio
+
+    from weather_server import WeatherServer
+
+    client = WeatherClient(args.api_key, cache_dir=args.cache_dir, provider=args.provider,
+                           calls_per_minute=args.calls_per_minute)
+    server = WeatherServer(client, args.host, args.port, max_workers=args.workers)
+
+    async def run():
+        await server.start()
+        print(f"Serving weather data at http://{server.host}:{server.port} "
+              f"(/current, /daily, /chart.png, /health, /metrics)")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        client.close()
+        print_metrics(args.metrics)
+    return 0
+
+
+def cmd_dashboard(args):
+    # Tk, matplotlib and the GUI module are only loaded here
+    sys.argv = [DASHBOARD_SCRIPT] + args.dashboard_args
+    runpy.run_path(DASHBOARD_SCRIPT, run_name='__main__')
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='weather', description="OpenWeatherMap dashboard and CLI")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch = subparsers.add_parser('fetch', help="fetch current conditions and a daily forecast")
+    fetch.add_argument('city')
+    fetch.add_argument('--json', action='store_true', help="print JSON instead of text")
+    fetch.add_argument('--days', type=int, default=5, help="number of forecast days")
+    fetch.add_argument('--api-key', default=os.environ.get('OPENWEATHER_API_KEY', ""),
+                       help="OpenWeatherMap API key (default: $OPENWEATHER_API_KEY)")
+    fetch.add_argument('--provider', choices=PROVIDERS, default='auto',
+                       help="One Call 3.0 with 2.5 fallback (auto), onecall or 2.5")
+    fetch.add_argument('--cache-dir', help="directory for the on-disk response cache")
+    fetch.add_argument('--history', nargs='?', const=DEFAULT_HISTORY_PATH,
+                       help="also record the result in the history database")
+    fetch.add_argument('--metrics', choices=('json', 'prometheus'),
+                       help="print request timing spans to stderr")
+    fetch.set_defaults(func=cmd_fetch)
+
+    history = subparsers.add_parser('history', help="print recorded observations for a city")
+    history.add_argument('city', help="city key as recorded, e.g. 'London,GB'")
+    history.add_argument('--days', type=float, default=7)
+    history.add_argument('--json', action='store_true', help="print JSON instead of text")
+    history.add_argument('--history', default=DEFAULT_HISTORY_PATH, help="history database path")
+    history.set_defaults(func=cmd_history)
+
+    serve = subparsers.add_parser('serve', help="serve current conditions, forecasts and charts over HTTP")
+    serve.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--api-key', default=os.environ.get('OPENWEATHER_API_KEY', ""),
+                       help="OpenWeatherMap API key (default: $OPENWEATHER_API_KEY)")
+    serve.add_argument('--provider', choices=PROVIDERS, default='auto',
+                       help="One Call 3.0 with 2.5 fallback (auto), onecall or 2.5")
+    serve.add_argument('--cache-dir', help="directory for the on-disk response cache")
+    serve.add_argument('--calls-per-minute', type=int, default=60, help="upstream rate limit")
+    serve.add_argument('--workers', type=int, default=8, help="threads for upstream fetches")
+    serve.add_argument('--metrics', choices=('json', 'prometheus'),
+                       help="print request timing spans to stderr on exit")
+    serve.set_defaults(func=cmd_serve)
+
+    dashboard = subparsers.add_parser('dashboard', help="open the Tk dashboard")
+    dashboard.add_argument('dashboard_args', nargs=argparse.REMAINDER,
+                           help="options passed through to the dashboard (--cities, --city-file, ...)")
+    dashboard.set_defaults(func=cmd_dashboard)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""Derived weather metrics computed with NumPy over forecast arrays.
+
+Every function works along the last axis and broadcasts over any leading
+axes, so one call handles a single city's forecast (shape (slots,)) or many
+cities stacked with stack_forecasts (shape (cities, slots)) at about the
+same cost. Temperatures are in °C, humidity in %, wind speed in m/s.
+"""
+import numpy as np
+
+# Lower edges of the wind-rose speed bins in m/s; the last bin is open-ended
+WIND_SPEED_BINS = (0, 2, 4, 6, 8, 10)
+
+STACK_FIELDS = ('temp', 'humidity', 'wind_speed', 'wind_deg')
+
+
+def dew_point(temp, humidity):
+    """Dew point from the Magnus formula (Alduchov & Eskridge coefficients)"""
+    a, b = 17.625, 243.04
+    temp = np.asarray(temp, dtype=float)
+    gamma = np.log(np.clip(humidity, 1, 100) / 100) + a * temp / (b + temp)
+    return b * gamma / (a - gamma)
+
+
+def heat_index(temp, humidity):
+    """NWS heat index (Rothfusz regression with its low/high humidity adjustments)"""
+    t = np.asarray(temp, dtype=float) * 9 / 5 + 32
+    rh = np.asarray(humidity, dtype=float)
+    simple = 0.5 * (t + 61 + (t - 68) * 1.2 + rh * 0.094)
+    full = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh - 0.00683783 * t * t
+            - 0.05481717 * rh * rh + 0.00122874 * t * t * rh + 0.00085282 * t * rh * rh
+            - 0.00000199 * t * t * rh * rh)
+    dry = (rh < 13) & (t >= 80) & (t <= 112)
+    full = full - np.where(dry, (13 - rh) / 4 * np.sqrt(np.clip(17 - np.abs(t - 95), 0, None) / 17), 0)
+    humid = (rh > 85) & (t >= 80) & (t <= 87)
+    full = full + np.where(humid, (rh - 85) / 10 * (87 - t) / 5, 0)
+    index = np.where((simple + t) / 2 >= 80, full, simple)
+    return (index - 32) * 5 / 9
+
+
+def wind_chill(temp, wind_speed):
+    """Wind chill index (Environment Canada/NWS); the air temperature outside its valid range"""
+    temp = np.asarray(temp, dtype=float)
+    v = np.power(np.asarray(wind_speed, dtype=float) * 3.6, 0.16)
+    chill = 13.12 + 0.6215 * temp - 11.37 * v + 0.3965 * temp * v
+    return np.where((temp <= 10) & (np.asarray(wind_speed) * 3.6 > 4.8), chill, temp)
+
+
+def feels_like(temp, humidity, wind_speed):
+    """Apparent temperature: heat index when hot, wind chill when cold and windy, otherwise the air temperature"""
+    temp = np.asarray(temp, dtype=float)
+    hot = temp >= 26.7
+    return np.where(hot, heat_index(temp, humidity), wind_chill(temp, wind_speed))
+
+
+def windowed_sum(values, window):
+    """Sum over the trailing window ending at each slot (shorter at the start)"""
+    total = np.cumsum(values, axis=-1)
+    total[..., window:] = total[..., window:] - total[..., :-window].copy()
+    return total
+
+
+def rolling_mean(values, window):
+    """Trailing moving average; the first slots average what is available"""
+    values = np.asarray(values, dtype=float)
+    counts = np.minimum(np.arange(1, values.shape[-1] + 1), window)
+    return windowed_sum(values, window) / counts
+
+
+def rolling_slope(times, values, window):
+    """Least-squares slope over each full trailing window (NaN before that), in value units per time unit"""
+    values = np.asarray(values, dtype=float)
+    t = np.asarray(times, dtype=float)
+    # Relative times keep the squared sums well conditioned
+    t = t - t[..., :1]
+    n = np.minimum(np.arange(1, values.shape[-1] + 1), window)
+    sum_t = windowed_sum(t, window)
+    sum_v = windowed_sum(values, window)
+    denominator = n * windowed_sum(t * t, window) - sum_t * sum_t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * windowed_sum(t * values, window) - sum_t * sum_v) / denominator
+    return np.where((n == window) & (denominator > 0), slope, np.nan)
+
+
+def trend_slope(times, values):
+    """Least-squares slope of each whole series"""
+    t = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    t = t - np.nanmean(t, axis=-1, keepdims=True)
+    v = values - np.nanmean(values, axis=-1, keepdims=True)
+    return np.nansum(t * v, axis=-1) / np.nansum(t * t, axis=-1)
+
+
+def wind_rose(direction, speed, sectors=16, bins=WIND_SPEED_BINS, normalize=True):
+    """Histogram of wind by direction sector and speed bin, shape (..., sectors, len(bins))
+
+    Sector 0 is centred on north and sectors run clockwise. With normalize the
+    counts are percentages of each series' valid (non-NaN) samples.
+    """
+    direction = np.asarray(direction, dtype=float)
+    speed = np.asarray(speed, dtype=float)
+    batch_shape = direction.shape[:-1]
+    valid = ~(np.isnan(direction) | np.isnan(speed))
+
+    width = 360 / sectors
+    sector = (np.where(valid, direction, 0) + width / 2) % 360 // width
+    speed_bin = np.clip(np.searchsorted(bins, np.where(valid, speed, 0), side='right') - 1, 0, len(bins) - 1)
+
+    # One bincount over a flat (series, sector, bin) index covers every series at once
+    series = np.arange(int(np.prod(batch_shape))).reshape(batch_shape + (1,))
+    index = (series * sectors + sector.astype(np.intp)) * len(bins) + speed_bin
+    counts = np.bincount(np.broadcast_to(index, direction.shape)[valid],
+                         minlength=series.size * sectors * len(bins))
+    counts = counts.reshape(batch_shape + (sectors, len(bins))).astype(float)
+    if normalize:
+        counts *= 100 / np.maximum(valid.sum(axis=-1), 1)[..., None, None]
+    return counts
+
+
+def stack_forecasts(forecasts, fields=STACK_FIELDS):
+    """Stack columnar forecasts of several cities into (cities, slots) arrays padded with NaN"""
+    slots = max((forecast['dt'].size for forecast in forecasts), default=0)
+    stacked = {}
+    for field in ('dt',) + tuple(fields):
+        array = np.full((len(forecasts), slots), np.nan)
+        for row, forecast in zip(array, forecasts):
+            row[:forecast['dt'].size] = forecast[field]
+        stacked[field] = array
+    return stacked
+
+
+def derive_metrics(forecast, window_hours=24):
+    """Dew point, heat index, wind chill, apparent temperature, moving average and trend of the temperature
+
+    Accepts a columnar forecast from parse_forecast or several stacked with
+    stack_forecasts; trends are in °C per day over a trailing window.
+    """
+    dt = np.asarray(forecast['dt'], dtype=float)
+    temp = forecast['temp']
+    humidity = forecast['humidity']
+    wind_speed = forecast['wind_speed']
+
+    steps = np.diff(dt, axis=-1)
+    step = float(np.nanmedian(steps)) if steps.size and not np.isnan(steps).all() else 3600.0
+    window = max(1, int(round(window_hours * 3600 / step)))
+    hours = dt / 3600
+    with np.errstate(invalid='ignore'):
+        return {
+            'dew_point': dew_point(temp, humidity),
+            'heat_index': heat_index(temp, humidity),
+            'wind_chill': wind_chill(temp, wind_speed),
+            'feels_like': feels_like(temp, humidity, wind_speed),
+            'temp_mean': rolling_mean(temp, window),
+            'temp_trend': rolling_slope(hours, temp, window) * 24,
+            'window': window
+        }
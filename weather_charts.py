@@ -0,0 +1,343 @@
+"""Chart definitions shared by the dashboard, the HTTP server and the soak test.
+
+Each chart builds its figure and persistent artists once, then updates them
+in place: the forecast charts from a columnar forecast (see ForecastColumns),
+the History and Live Data charts from plain arrays. The dashboard creates
+charts with animated artists, which its ChartRenderer blits over a cached
+background; the server draws them normally and saves PNGs. Only the Agg
+canvas is used, so nothing here needs Tk or a display.
+"""
+import io
+
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from weather_analytics import WIND_SPEED_BINS, derive_metrics, wind_rose
+
+FIGURE_COLOR = '#1a1a2e'
+AXES_COLOR = '#2a2a3e'
+
+
+def create_figure(width=1000, height=400):
+    """Figure with an Agg canvas, sized in pixels"""
+    fig = Figure(figsize=(width / 100, height / 100), dpi=100, facecolor=FIGURE_COLOR)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def style_axes(ax, ylabel=None):
+    ax.set_facecolor(AXES_COLOR)
+    ax.tick_params(colors='white')
+    ax.grid(True, alpha=0.3, color='white')
+    if ylabel:
+        ax.set_ylabel(ylabel, color='white')
+
+
+def forecast_times(forecast, count=None):
+    """Matplotlib date numbers for the first count forecast slots (all by default)"""
+    return mdates.date2num(forecast['local_time'][:count].astype('datetime64[s]'))
+
+
+def forecast_hours(forecast, count=None):
+    """Hours covered by the first count forecast slots (all by default)"""
+    dt = forecast['dt'][:count]
+    step = int(forecast['dt'][1] - forecast['dt'][0]) if forecast['dt'].size > 1 else 3600
+    return int(dt[-1] - dt[0] + step) // 3600
+
+
+class Chart:
+    """A figure whose data artists are built once and then updated in place
+
+    With animated=True the data artists are skipped by normal draws, so a
+    renderer can cache everything else and blit just them.
+    """
+
+    name = None
+
+    def __init__(self, fig=None, animated=False):
+        self.fig = fig if fig is not None else create_figure()
+        self.animated = animated
+        self.artists = self.build()
+
+    def build(self):
+        """Create the axes and data artists; returns the artists that change on update"""
+        raise NotImplementedError
+
+    def set_title(self, ax, title, city=''):
+        title = f'{city} {title}' if city else title
+        if ax.get_title() == title:
+            return False
+        ax.title.set_text(title)
+        return True
+
+    def render_png(self):
+        """Draw the whole figure and return it as PNG bytes"""
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format='png', facecolor=self.fig.get_facecolor())
+        return buffer.getvalue()
+
+
+class ForecastChart(Chart):
+    """A chart drawn from a columnar forecast"""
+
+    def update(self, forecast, derived=None, city=''):
+        """Load a forecast into the artists; returns True when a title (part of the background) changed"""
+        raise NotImplementedError
+
+
+class TemperatureChart(ForecastChart):
+    """Temperature over the first 24 forecast slots"""
+
+    name = 'temperature'
+
+    def build(self):
+        self.ax = self.fig.subplots()
+        style_axes(self.ax, 'Temperature (°C)')
+        self.line, = self.ax.plot([], [], color='#FF6B6B', linewidth=2, marker='o', markersize=4,
+                                  animated=self.animated)
+        self.ax.set_title('Temperature Trend (24h)', color='white', fontsize=14, fontweight='bold')
+        self.ax.xaxis_date()
+        self.fig.autofmt_xdate()
+        return [self.line]
+
+    def update(self, forecast, derived=None, city=''):
+        # 24 forecast slots - hourly from One Call, 3-hourly from the 2.5 API
+        changed = self.set_title(self.ax, f'Temperature Trend ({forecast_hours(forecast, 24)}h)', city)
+        self.line.set_data(forecast_times(forecast, 24), forecast['temp'][:24])
+        self.ax.relim()
+        self.ax.autoscale_view()
+        return changed
+
+
+class HumidityChart(ForecastChart):
+    """Humidity and pressure over the first 24 forecast slots"""
+
+    name = 'humidity'
+    PANELS = (('humidity', '#4ECDC4', 's', 'Humidity Levels', 'Humidity (%)'),
+              ('pressure', '#45B7D1', '^', 'Atmospheric Pressure', 'Pressure (hPa)'))
+
+    def build(self):
+        self.axes = self.fig.subplots(2, 1)
+        self.lines = []
+        for ax, (field, color, marker, title, ylabel) in zip(self.axes, self.PANELS):
+            style_axes(ax, ylabel)
+            line, = ax.plot([], [], color=color, linewidth=2, marker=marker, markersize=4, animated=self.animated)
+            ax.set_title(title, color='white', fontsize=12, fontweight='bold')
+            ax.xaxis_date()
+            self.lines.append(line)
+        self.fig.tight_layout()
+        return list(self.lines)
+
+    def update(self, forecast, derived=None, city=''):
+        times = forecast_times(forecast, 24)
+        changed = False
+        for ax, line, (field, _, _, title, _) in zip(self.axes, self.lines, self.PANELS):
+            changed = self.set_title(ax, title, city) or changed
+            line.set_data(times, forecast[field][:24])
+            ax.relim()
+            ax.autoscale_view()
+        return changed
+
+
+class WindRoseChart(ForecastChart):
+    """Wind rose over the whole forecast: one stacked bar series per speed bin"""
+
+    name = 'wind'
+    sectors = 16
+
+    def build(self):
+        self.ax = self.fig.subplots(subplot_kw=dict(projection='polar'))
+        self.ax.set_facecolor(AXES_COLOR)
+        theta = np.radians(np.arange(self.sectors) * 360 / self.sectors)
+        cmap = colormaps['viridis']
+        self.bars = []
+        for i, low in enumerate(WIND_SPEED_BINS):
+            label = f"{low}-{WIND_SPEED_BINS[i + 1]} m/s" if i + 1 < len(WIND_SPEED_BINS) else f"{low}+ m/s"
+            self.bars.append(self.ax.bar(theta, np.zeros(self.sectors), width=2 * np.pi / self.sectors * 0.9,
+                                         bottom=0, color=cmap(i / (len(WIND_SPEED_BINS) - 1)),
+                                         edgecolor=FIGURE_COLOR, label=label, animated=self.animated))
+        self.ax.set_title('Wind Rose (24h)', color='white', fontsize=14, fontweight='bold', pad=20)
+        self.ax.set_theta_zero_location('N')
+        self.ax.set_theta_direction(-1)
+        self.ax.tick_params(colors='white')
+        self.ax.yaxis.set_major_formatter('{x:.0f}%')
+        self.ax.legend(loc='upper left', bbox_to_anchor=(1.1, 1), fontsize=8)
+        # Leave room above the polar axes for the title
+        self.fig.subplots_adjust(top=0.8, bottom=0.1)
+        return [patch for bars in self.bars for patch in bars]
+
+    def update(self, forecast, derived=None, city=''):
+        changed = self.set_title(self.ax, f'Wind Rose ({forecast_hours(forecast)}h)', city)
+        rose = wind_rose(forecast['wind_deg'], forecast['wind_speed'], sectors=self.sectors)
+        # Bars are resized in place, each bin stacked on the ones below it
+        bottoms = np.zeros(self.sectors)
+        for bars, heights in zip(self.bars, rose.T):
+            for patch, height, bottom in zip(bars, heights, bottoms):
+                patch.set_height(height)
+                patch.set_y(bottom)
+            bottoms = bottoms + heights
+        self.ax.set_ylim(0, max(bottoms.max(), 1) * 1.1)
+        return changed
+
+
+class ComfortChart(ForecastChart):
+    """Comfort indices derived from temperature, humidity and wind"""
+
+    name = 'comfort'
+    SERIES = (('temp', 'Temperature', '#FF6B6B'), ('dew_point', 'Dew point', '#4ECDC4'),
+              ('heat_index', 'Heat index', '#FFD166'), ('wind_chill', 'Wind chill', '#45B7D1'))
+
+    def build(self):
+        self.ax = self.fig.subplots()
+        style_axes(self.ax, '°C')
+        self.lines = {}
+        for key, label, color in self.SERIES:
+            self.lines[key], = self.ax.plot([], [], color=color, linewidth=2, label=label, animated=self.animated)
+        self.ax.set_title('Comfort Indices', color='white', fontsize=14, fontweight='bold')
+        self.ax.legend(loc='upper left', fontsize=8)
+        self.ax.xaxis_date()
+        self.fig.autofmt_xdate()
+        return list(self.lines.values())
+
+    def update(self, forecast, derived=None, city=''):
+        derived = derive_metrics(forecast) if derived is None else derived
+        changed = self.set_title(self.ax, 'Comfort Indices', city)
+        times = forecast_times(forecast)
+        for key, line in self.lines.items():
+            line.set_data(times, forecast['temp'] if key == 'temp' else derived[key])
+        self.ax.relim()
+        self.ax.autoscale_view()
+        return changed
+
+
+class TrendChart(ForecastChart):
+    """Temperature with its 24h moving average, and the rolling 24h trend below"""
+
+    name = 'trend'
+
+    def build(self):
+        self.trend_ax, self.slope_ax = self.fig.subplots(2, 1, sharex=True)
+        self.temp_line, = self.trend_ax.plot([], [], color='#FF6B6B', linewidth=1, alpha=0.6,
+                                             label='Temperature', animated=self.animated)
+        self.mean_line, = self.trend_ax.plot([], [], color='#FFD166', linewidth=2, label='24h mean',
+                                             animated=self.animated)
+        self.trend_ax.set_title('Temperature and 24h Moving Average', color='white', fontsize=12, fontweight='bold')
+        self.trend_ax.legend(loc='upper left', fontsize=8)
+
+        self.slope_line, = self.slope_ax.plot([], [], color='#4ECDC4', linewidth=2, animated=self.animated)
+        self.slope_ax.axhline(0, color='white', alpha=0.5, linewidth=1)
+        self.slope_ax.set_title('Trend (24h window)', color='white', fontsize=12, fontweight='bold')
+
+        style_axes(self.trend_ax, '°C')
+        style_axes(self.slope_ax, '°C/day')
+        for ax in (self.trend_ax, self.slope_ax):
+            ax.xaxis_date()
+        self.fig.tight_layout()
+        return [self.temp_line, self.mean_line, self.slope_line]
+
+    def update(self, forecast, derived=None, city=''):
+        derived = derive_metrics(forecast) if derived is None else derived
+        changed = self.set_title(self.trend_ax, 'Temperature and 24h Moving Average', city)
+        changed = self.set_title(self.slope_ax, 'Trend (24h window)', city) or changed
+        times = forecast_times(forecast)
+        self.temp_line.set_data(times, forecast['temp'])
+        self.mean_line.set_data(times, derived['temp_mean'])
+        self.slope_line.set_data(times, derived['temp_trend'])
+        for ax in (self.trend_ax, self.slope_ax):
+            ax.relim()
+            ax.autoscale_view()
+        return changed
+
+
+class HistoryChart(Chart):
+    """Observed temperature from the history store"""
+
+    name = 'history'
+
+    def __init__(self, fig=None, animated=False, days=7):
+        self.days = days
+        super().__init__(fig, animated)
+
+    def build(self):
+        self.ax = self.fig.subplots()
+        style_axes(self.ax, 'Temperature (°C)')
+        self.line, = self.ax.plot([], [], color='#FFD166', linewidth=2, animated=self.animated)
+        self.ax.set_title(f'Observed Temperature ({self.days}d)', color='white', fontsize=14, fontweight='bold')
+        self.ax.xaxis_date()
+        self.fig.autofmt_xdate()
+        return [self.line]
+
+    def update(self, times, temps):
+        """times are Matplotlib date numbers in local time"""
+        self.line.set_data(times, temps)
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+
+class LiveDataChart(Chart):
+    """Simulated live readings plotted against seconds before now, so the x-axis never moves"""
+
+    name = 'live'
+
+    def __init__(self, fig=None, animated=False, seconds=50):
+        self.seconds = seconds
+        # Rows of x, temperature and humidity, reused from tick to tick
+        self.values = np.empty((3, 0))
+        super().__init__(fig, animated)
+
+    def build(self):
+        self.ax = self.fig.subplots()
+        style_axes(self.ax, 'Value')
+        self.temp_line, = self.ax.plot([], [], 'r-', linewidth=2, label='Temperature (°C)', alpha=0.8,
+                                       animated=self.animated)
+        self.humidity_line, = self.ax.plot([], [], 'b-', linewidth=2, label='Humidity (%/5)', alpha=0.8,
+                                           animated=self.animated)
+        self.ax.set_title('Live Weather Simulation', color='white', fontsize=14, fontweight='bold')
+        self.ax.set_xlabel('Seconds', color='white')
+        self.ax.legend(loc='upper left')
+        self.ax.set_xlim(-self.seconds, 0)
+        self.ax.set_ylim(0, 30)
+        return [self.temp_line, self.humidity_line]
+
+    def update(self, times, temps, humidity):
+        """Plot readings against seconds before the newest one
+
+        The readings are copied, so the caller's buffers may change as soon
+        as this returns.
+        """
+        count = len(times)
+        if not count:
+            self.temp_line.set_data([], [])
+            self.humidity_line.set_data([], [])
+            return
+        if count > self.values.shape[1]:
+            self.values = np.empty((3, max(count, 2 * self.values.shape[1])))
+        x, temp_values, humidity_values = self.values[:, :count]
+        np.subtract(times, times[-1], out=x)
+        np.copyto(temp_values, temps)
+        np.copyto(humidity_values, humidity)
+        self.temp_line.set_data(x, temp_values)
+        self.humidity_line.set_data(x, humidity_values)
+
+        # Only grow the y-range when the data leaves it, forcing a single full redraw
+        low = min(temp_values.min(), humidity_values.min())
+        high = max(temp_values.max(), humidity_values.max())
+        y_min, y_max = self.ax.get_ylim()
+        if low < y_min or high > y_max:
+            self.ax.set_ylim(min(low, y_min) - 2, max(high, y_max) + 2)
+
+
+FORECAST_CHARTS = {chart.name: chart for chart in
+                   (TemperatureChart, HumidityChart, WindRoseChart, ComfortChart, TrendChart)}
+
+
+def render_chart_png(kind, forecast, city='', width=1000, height=400):
+    """Render one forecast chart to PNG bytes"""
+    if kind not in FORECAST_CHARTS:
+        raise ValueError(f"Unknown chart {kind!r}, expected one of {', '.join(FORECAST_CHARTS)}")
+    chart = FORECAST_CHARTS[kind](create_figure(width, height))
+    chart.update(forecast, city=city)
+    return chart.render_png()
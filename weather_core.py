@@ -0,0 +1,1225 @@
+"""GUI-free weather core: API access, caching, parsing and history storage.
+
+Importable without Tk or matplotlib so it can run from cron jobs, containers
+and the command line (see weather.py).
+"""
+import requests
+import json
+import logging
+import gc
+import sys
+import tracemalloc
+from datetime import datetime, date
+import numpy as np
+import threading
+import time
+import random
+import os
+import hashlib
+import sqlite3
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+try:
+    import ijson
+except ImportError:  # optional; large payloads are then decoded with json.load
+    ijson = None
+
+API_BASE_URL = "http://api.openweathermap.org/data/2.5"
+# Condition icons are static files on the website rather than the API host
+ICON_URL = "https://openweathermap.org/img/wn/{code}@2x.png"
+
+logger = logging.getLogger(__name__)
+
+
+class SpanHistogram:
+    """Bucketed timing histogram plus a window of recent samples for percentiles"""
+
+    BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self, window=1024):
+        self.bucket_counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, ms):
+        index = next((i for i, bound in enumerate(self.BUCKETS_MS) if ms <= bound), len(self.BUCKETS_MS))
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.samples.append(ms)
+
+    def summary(self):
+        samples = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99)) if samples.size else (0.0, 0.0, 0.0)
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'p99_ms': float(p99),
+            'max_ms': self.max_ms
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of named timing spans"""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, ms):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = SpanHistogram(self.window)
+            histogram.observe(ms)
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def timed(self, name):
+        """Decorator recording every call of a function as a span"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    def to_prometheus(self, metric='weather_span_duration_seconds'):
+        lines = [f"# HELP {metric} Duration of instrumented weather app spans.",
+                 f"# TYPE {metric} histogram"]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(SpanHistogram.BUCKETS_MS + (None,), histogram.bucket_counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound is None else repr(bound / 1000)
+                    lines.append(f'{metric}_bucket{{span="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{span="{name}"}} {histogram.total_ms / 1000}')
+                lines.append(f'{metric}_count{{span="{name}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+# Process-wide registry shared by the client, the dashboard and the CLI
+metrics = MetricsRegistry()
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where it can't be read"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # Peak rather than current RSS outside Linux, but it still only rises when memory does
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryWatchdog:
+    """Periodic RSS sampler that logs growth, names the growing lines and resets subsystems past a budget
+
+    tracemalloc has a memory cost of its own, so unless trace is set it is only
+    started once RSS has grown by half the budget.
+    """
+
+    def __init__(self, growth_limit_mb=64, trace=False, trace_frames=1, top=5, history=288):
+        self.growth_limit = growth_limit_mb * 1024 * 1024
+        # Without a readable RSS, traced memory is the only signal
+        self.trace = trace or current_rss() is None
+        self.trace_frames = trace_frames
+        self.top = top
+        # (time, rss, traced) per check; a day of 5-minute checks by default
+        self.samples = deque(maxlen=history)
+        self.resets = OrderedDict()
+        self.reset_count = 0
+        self.baseline_rss = None
+        self.baseline_traced = None
+        self._baseline_lines = None
+        self._started_tracing = False
+        if self.trace:
+            self.start_tracing()
+
+    def add_reset(self, name, callback):
+        """Register a callback that drops one subsystem's caches and buffered state"""
+        self.resets[name] = callback
+
+    def start_tracing(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+            self._started_tracing = True
+        self._baseline_lines = self.line_sizes()
+
+    def check(self, now=None):
+        """Take a sample, log growth since the baseline and reset subsystems when over budget"""
+        now = time.time() if now is None else now
+        rss = current_rss()
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self.samples.append((now, rss, traced))
+        if self.baseline_rss is None and self.baseline_traced is None:
+            self.rebaseline(rss, traced)
+            return self.samples[-1]
+        
+        growth = self.growth(rss, traced)
+        logger.info("RSS %s, %+.1f MB since baseline%s", self.format_mb(rss), growth / 1048576,
+                    f", {self.format_mb(traced)} traced" if traced is not None else "")
+        if growth > self.growth_limit / 2:
+            if self._baseline_lines is None:
+                logger.info("Starting tracemalloc to find the source of the growth")
+                self.start_tracing()
+            else:
+                for frame, diff, size in self.top_growth():
+                    logger.info("  %s:%s %+.1f KiB (%.1f KiB total)", frame.filename, frame.lineno,
+                                diff / 1024, size / 1024)
+        
+        if growth > self.growth_limit:
+            logger.warning("Memory grew %.1f MB past the baseline, resetting %s", growth / 1048576,
+                           ", ".join(self.resets) or "nothing")
+            self.reset()
+            if self._started_tracing and not self.trace:
+                self.stop()
+            self.rebaseline(current_rss(), tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None)
+        return self.samples[-1]
+
+    def growth(self, rss, traced):
+        if rss is not None and self.baseline_rss is not None:
+            return rss - self.baseline_rss
+        if traced is not None and self.baseline_traced is not None:
+            return traced - self.baseline_traced
+        return 0
+
+    def rebaseline(self, rss, traced):
+        self.baseline_rss = rss
+        self.baseline_traced = traced
+        if self._baseline_lines is not None:
+            self._baseline_lines = self.line_sizes()
+
+    def line_sizes(self):
+        # Only per-line totals are kept; a whole snapshot would cost as much memory as it traces
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        return {stat.traceback[0]: stat.size for stat in snapshot.statistics('lineno')}
+
+    def top_growth(self):
+        """(frame, bytes grown, bytes now) for the source lines that grew most since the baseline"""
+        growth = [(frame, size - self._baseline_lines.get(frame, 0), size)
+                  for frame, size in self.line_sizes().items()]
+        growth.sort(key=lambda item: item[1], reverse=True)
+        return [item for item in growth[:self.top] if item[1] > 0]
+
+    def reset(self):
+        for name, callback in self.resets.items():
+            try:
+                callback()
+            except Exception:
+                logger.exception("Resetting %s failed", name)
+        gc.collect()
+        self.reset_count += 1
+
+    def stop(self):
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+        self._baseline_lines = None
+
+    @staticmethod
+    def format_mb(value):
+        return "n/a" if value is None else f"{value / 1048576:.1f} MB"
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of API responses with per-endpoint TTLs and an optional disk layer"""
+
+    # OpenWeatherMap refreshes current conditions roughly every 10 minutes
+    # and the 3-hourly forecast far less often than that; city coordinates never change
+    DEFAULT_TTLS = {'weather': 600, 'forecast': 1800, 'onecall': 600, 'geocode': 30 * 86400}
+    
+    # Bumped whenever the cached data shape changes so older files are ignored
+    DISK_FORMAT = 3
+
+    def __init__(self, max_entries=512, ttls=None, cache_dir=None):
+        self.max_entries = max_entries
+        self.ttls = dict(self.DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _key(self, endpoint, city):
+        return (endpoint, city.strip().lower())
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(key[1].encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key[0]}_{digest}.v{self.DISK_FORMAT}.json")
+
+    @staticmethod
+    def _encode_array(value):
+        if isinstance(value, np.ndarray):
+            return {'__ndarray__': value.tolist(), 'dtype': str(value.dtype)}
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+    @staticmethod
+    def _decode_array(obj):
+        if '__ndarray__' in obj:
+            return np.array(obj['__ndarray__'], dtype=obj['dtype'])
+        return obj
+
+    def _load_from_disk(self, key):
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f, object_hook=self._decode_array)
+        except (OSError, ValueError):
+            return None
+
+    def _save_to_disk(self, key, entry):
+        path = self._disk_path(key)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, default=self._encode_array)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup(self, endpoint, city):
+        """Return (entry, is_fresh); entry is None on a miss"""
+        key = self._key(endpoint, city)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.cache_dir:
+                entry = self._load_from_disk(key)
+                if entry is not None:
+                    self._insert(key, entry)
+            if entry is None:
+                return None, False
+
+            self._entries.move_to_end(key)
+            age = time.time() - entry['fetched_at']
+            return entry, age < self.ttls.get(endpoint, 0)
+
+    def expires_at(self, endpoint, city):
+        """Time at which the cached entry goes stale, or None when nothing is cached"""
+        entry, _ = self.lookup(endpoint, city)
+        if entry is None:
+            return None
+        return entry['fetched_at'] + self.ttls.get(endpoint, 0)
+
+    def store(self, endpoint, city, data, headers=None):
+        headers = headers or {}
+        key = self._key(endpoint, city)
+        entry = {
+            'data': data,
+            'fetched_at': time.time(),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified')
+        }
+        with self._lock:
+            self._insert(key, entry)
+        if self.cache_dir:
+            self._save_to_disk(key, entry)
+        return entry
+
+    def touch(self, endpoint, city):
+        """Mark a cached entry as fresh again, e.g. after a 304 Not Modified"""
+        key = self._key(endpoint, city)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry['fetched_at'] = time.time()
+        if self.cache_dir:
+            self._save_to_disk(key, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class AssetCache:
+    """Small binary assets such as condition icons, kept in an LRU in memory and as files on disk
+
+    get/put go through memory; read/write/save_json/load_json touch only the
+    disk, for one-off files like the dashboard snapshot. Without a directory
+    the cache is memory-only.
+    """
+
+    def __init__(self, directory=None, max_entries=128):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def read(self, name):
+        if not self.directory:
+            return None
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def write(self, name, data):
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, name)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def get(self, name):
+        """Bytes stored under name, from memory or disk, or None"""
+        with self._lock:
+            data = self._entries.get(name)
+            if data is not None:
+                self._entries.move_to_end(name)
+                return data
+        data = self.read(name)
+        if data is not None:
+            self._insert(name, data)
+        return data
+
+    def put(self, name, data):
+        self._insert(name, data)
+        self.write(name, data)
+
+    def _insert(self, name, data):
+        with self._lock:
+            self._entries[name] = data
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def fetch(self, name, download):
+        """Bytes for name, calling download() once to get them when they are not cached"""
+        data = self.get(name)
+        if data is None:
+            data = download()
+            if data is not None:
+                self.put(name, data)
+        return data
+
+    def save_json(self, name, obj):
+        """Write obj as JSON; NumPy arrays are encoded like the response cache does"""
+        self.write(name, json.dumps(obj, default=ResponseCache._encode_array).encode('utf-8'))
+
+    def load_json(self, name):
+        data = self.read(name)
+        if data is None:
+            return None
+        try:
+            return json.loads(data, object_hook=ResponseCache._decode_array)
+        except ValueError:
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def create_http_session(pool_size=10):
+    """Shared keep-alive session so refreshes reuse pooled TCP/TLS connections"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class RateLimiter:
+    """Thread-safe sliding window allowing at most calls_per_minute calls in any 60 seconds
+
+    Unlike a token bucket holding a minute's worth of tokens, a burst never
+    pushes a window over the API quota.
+    """
+
+    def __init__(self, calls_per_minute=60, window=60.0):
+        self.limit = max(1, calls_per_minute)
+        self.window = window
+        # Start times of the calls made within the last window, oldest first
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call may be made"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.window:
+                    self._calls.popleft()
+                if len(self._calls) < self.limit:
+                    self._calls.append(now)
+                    return
+                wait = self._calls[0] + self.window - now
+            time.sleep(wait)
+
+
+class RefreshScheduler:
+    """Decides when each city is polled next: one request in flight per city, polls timed to
+    when upstream data can have changed, and jittered exponential backoff on errors"""
+
+    def __init__(self, min_interval=30, max_interval=3600, update_interval=600,
+                 backoff_base=30, max_backoff=1800):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.update_interval = update_interval  # how often OpenWeatherMap refreshes an observation
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, city):
+        key = city.strip().lower()
+        if key not in self._states:
+            self._states[key] = {'in_flight': False, 'failures': 0, 'next_poll': 0.0, 'last_status': None}
+        return self._states[key]
+
+    def begin(self, city):
+        """Mark a request as in flight; False if one is already running for this city"""
+        with self._lock:
+            state = self._state(city)
+            if state['in_flight']:
+                return False
+            state['in_flight'] = True
+            return True
+
+    def succeed(self, city, observed_at=None, expires_at=None, now=None):
+        """Record a successful fetch and return seconds until the next useful poll"""
+        now = time.time() if now is None else now
+        next_poll = now + self.min_interval
+        if expires_at is not None:
+            next_poll = max(next_poll, expires_at)
+        if observed_at is not None:
+            next_poll = max(next_poll, observed_at + self.update_interval)
+        next_poll = min(next_poll, now + self.max_interval)
+        
+        with self._lock:
+            state = self._state(city)
+            state.update(in_flight=False, failures=0, next_poll=next_poll, last_status=200)
+        return next_poll - now
+
+    def fail(self, city, status=None, now=None):
+        """Record a failed fetch (status None for network errors) and return the backoff delay"""
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._state(city)
+            state['failures'] += 1
+            # Rate limiting means the whole quota is exhausted, so back off harder
+            base = self.backoff_base * (4 if status == 429 else 1)
+            delay = min(self.max_backoff, base * 2 ** (state['failures'] - 1))
+            delay = random.uniform(delay / 2, delay)
+            state.update(in_flight=False, next_poll=now + delay, last_status=status)
+        return delay
+
+    def delay(self, city, now=None):
+        """Seconds until the city should be polled again"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return max(0.0, self._state(city)['next_poll'] - now)
+
+    def describe(self, city):
+        """Short scheduler state for the status bar"""
+        with self._lock:
+            state = dict(self._state(city))
+        if state['in_flight']:
+            return "refresh in progress"
+        if not state['next_poll']:
+            return "not scheduled"
+        at = datetime.fromtimestamp(state['next_poll']).strftime('%H:%M:%S')
+        if state['failures']:
+            reason = f"HTTP {state['last_status']}" if state['last_status'] else "network error"
+            return f"retrying at {at} ({reason}, attempt {state['failures']})"
+        return f"next refresh at {at}"
+
+
+class BatchWeatherFetcher:
+    """Fetches many cities through a bounded worker pool, skipping cities already in flight"""
+
+    def __init__(self, fetch_city, max_workers=8):
+        self.fetch_city = fetch_city
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='weather-batch')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, cities, on_result):
+        """Queue cities for fetching; on_result(city, summary, error) is called from a worker thread"""
+        for city in cities:
+            with self._lock:
+                if city in self._pending:
+                    continue
+                self._pending.add(city)
+            self.executor.submit(self._run, city, on_result)
+
+    def _run(self, city, on_result):
+        summary, error = None, None
+        try:
+            summary = self.fetch_city(city)
+        except requests.exceptions.RequestException as e:
+            error = f"Network error: {str(e)}"
+        except Exception as e:
+            error = f"Error: {str(e)}"
+        finally:
+            with self._lock:
+                self._pending.discard(city)
+        on_result(city, summary, error)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def load_city_list(path):
+    """Read one city per line, ignoring blank lines and # comments"""
+    cities = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            city = line.split('#', 1)[0].strip()
+            if city and city not in cities:
+                cities.append(city)
+    return cities
+
+
+def parse_current_weather(data):
+    """Extract the fields shown in the current-conditions panel"""
+    return {
+        'city': data['name'],
+        'country': data['sys']['country'],
+        'temp': data['main']['temp'],
+        'feels_like': data['main']['feels_like'],
+        'humidity': data['main']['humidity'],
+        'pressure': data['main']['pressure'],
+        'description': data['weather'][0]['description'].title(),
+        'wind_speed': data['wind']['speed'],
+        'wind_deg': data['wind'].get('deg', 0),
+        'icon': data['weather'][0].get('icon', '')
+    }
+
+
+FORECAST_FIELDS = {
+    'temp': ('main', 'temp'),
+    'temp_min': ('main', 'temp_min'),
+    'temp_max': ('main', 'temp_max'),
+    'humidity': ('main', 'humidity'),
+    'pressure': ('main', 'pressure'),
+    'wind_speed': ('wind', 'speed'),
+    'wind_deg': ('wind', 'deg')
+}
+
+UNIX_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+
+def local_utc_offsets(dt):
+    """UTC offset of the local timezone for each timestamp (a scalar when DST doesn't change)"""
+    first = time.localtime(int(dt[0])).tm_gmtoff
+    last = time.localtime(int(dt[-1])).tm_gmtoff
+    if first == last:
+        return first
+    return np.array([time.localtime(int(t)).tm_gmtoff for t in dt], dtype=np.int64)
+
+
+def parse_forecast(forecast_list):
+    """Parse forecast entries once into a columnar dict of NumPy arrays"""
+    n = len(forecast_list)
+    forecast = {'dt': np.fromiter((item['dt'] for item in forecast_list), dtype=np.int64, count=n)}
+    for field, (group, key) in FORECAST_FIELDS.items():
+        forecast[field] = np.fromiter((item[group].get(key, 0) for item in forecast_list),
+                                      dtype=np.float64, count=n)
+    forecast['description'] = np.array([item['weather'][0]['description'].title() for item in forecast_list],
+                                       dtype=object)
+    forecast['icon'] = np.array([item['weather'][0].get('icon', '') for item in forecast_list], dtype=object)
+    return add_local_time(forecast)
+
+
+def add_local_time(forecast):
+    """Add machine-local wall-clock seconds, used for plotting and grouping by day"""
+    forecast['local_time'] = forecast['dt'] + (local_utc_offsets(forecast['dt']) if forecast['dt'].size else 0)
+    return forecast
+
+
+def summarize_daily_forecast(forecast, days=5):
+    """Group forecast entries by day into high/low and noon summaries"""
+    if not forecast or forecast['dt'].size == 0:
+        return []
+    
+    local_day = forecast['local_time'] // 86400
+    hour = (forecast['local_time'] % 86400) // 3600
+    day_numbers, starts = np.unique(local_day, return_index=True)
+    starts = starts[:days]
+    day_numbers = day_numbers[:days]
+    bounds = np.append(starts, starts[-1] + np.count_nonzero(local_day == day_numbers[-1]))
+    
+    highs = np.maximum.reduceat(forecast['temp_max'][:bounds[-1]], starts)
+    lows = np.minimum.reduceat(forecast['temp_min'][:bounds[-1]], starts)
+    
+    # Use noon data if available, otherwise first entry
+    noon = starts.copy()
+    noon_idx = np.flatnonzero(hour[:bounds[-1]] == 12)
+    noon_days, first = np.unique(local_day[noon_idx], return_index=True)
+    noon[np.searchsorted(day_numbers, noon_days)] = noon_idx[first]
+    
+    return [{
+        'date': date.fromordinal(int(day) + UNIX_EPOCH_ORDINAL),
+        'high': float(highs[i]),
+        'low': float(lows[i]),
+        'description': forecast['description'][noon[i]],
+        'icon': forecast['icon'][noon[i]],
+        'humidity': int(forecast['humidity'][noon[i]]),
+        'wind_speed': float(forecast['wind_speed'][noon[i]])
+    } for i, day in enumerate(day_numbers)]
+
+
+def daily_to_json(daily):
+    """Daily summaries with JSON-friendly dates and descriptions"""
+    return [dict(day, date=day['date'].isoformat(), description=str(day['description']), icon=str(day['icon']))
+            for day in daily]
+
+
+OBSERVATION_COLUMNS = ('temp', 'feels_like', 'humidity', 'pressure', 'wind_speed', 'wind_deg')
+SNAPSHOT_COLUMNS = ('temp', 'temp_min', 'temp_max', 'humidity', 'pressure', 'wind_speed', 'wind_deg')
+
+
+class WeatherHistoryStore:
+    """SQLite (WAL) time-series store of observations and forecast snapshots per city"""
+
+    def __init__(self, path, retention_days=90, snapshot_retention_days=14, downsample_after_days=7):
+        self.path = path
+        self.retention_days = retention_days
+        self.snapshot_retention_days = snapshot_retention_days
+        self.downsample_after_days = downsample_after_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS observations (
+                    city TEXT NOT NULL, dt INTEGER NOT NULL,
+                    temp REAL, feels_like REAL, humidity REAL, pressure REAL,
+                    wind_speed REAL, wind_deg REAL, description TEXT,
+                    PRIMARY KEY (city, dt)
+                ) WITHOUT ROWID""")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS forecast_snapshots (
+                    city TEXT NOT NULL, issued_at INTEGER NOT NULL, dt INTEGER NOT NULL,
+                    temp REAL, temp_min REAL, temp_max REAL, humidity REAL, pressure REAL,
+                    wind_speed REAL, wind_deg REAL,
+                    PRIMARY KEY (city, issued_at, dt)
+                ) WITHOUT ROWID""")
+
+    @staticmethod
+    def city_key(name, country):
+        return f"{name},{country}"
+
+    def record_observation(self, data):
+        """Append a /weather response; repeated observations of the same dt are ignored"""
+        current = parse_current_weather(data)
+        row = (self.city_key(current['city'], current['country']), data['dt'],
+               *(current[column] for column in OBSERVATION_COLUMNS), current['description'])
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def record_forecast(self, city_info, forecast, issued_at=None):
+        """Store a parsed forecast as a snapshot, at most one per city per hour"""
+        if forecast['dt'].size == 0:
+            return
+        issued_at = int(issued_at if issued_at is not None else time.time()) // 3600 * 3600
+        city = self.city_key(city_info['name'], city_info['country'])
+        columns = [forecast['dt'].tolist()] + [forecast[column].tolist() for column in SNAPSHOT_COLUMNS]
+        rows = [(city, issued_at, *values) for values in zip(*columns)]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO forecast_snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _query_columns(self, sql, params, columns):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        result = {'dt': np.array([row[0] for row in rows], dtype=np.int64)}
+        for i, column in enumerate(columns, start=1):
+            result[column] = np.array([row[i] for row in rows], dtype=np.float64)
+        return result
+
+    def observations(self, city, since=None, until=None):
+        """Observed values for a city between two timestamps as columnar NumPy arrays"""
+        since = 0 if since is None else int(since)
+        until = int(time.time()) if until is None else int(until)
+        return self._query_columns(
+            f"SELECT dt, {', '.join(OBSERVATION_COLUMNS)} FROM observations "
+            "WHERE city = ? AND dt BETWEEN ? AND ? ORDER BY dt",
+            (city, since, until), OBSERVATION_COLUMNS)
+
+    def forecast_snapshot(self, city, issued_at=None):
+        """The latest forecast snapshot issued at or before a timestamp"""
+        issued_at = int(time.time()) if issued_at is None else int(issued_at)
+        return self._query_columns(
+            f"SELECT dt, {', '.join(SNAPSHOT_COLUMNS)} FROM forecast_snapshots WHERE city = ? AND issued_at = "
+            "(SELECT MAX(issued_at) FROM forecast_snapshots WHERE city = ? AND issued_at <= ?) ORDER BY dt",
+            (city, city, issued_at), SNAPSHOT_COLUMNS)
+
+    def cities(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT city FROM observations ORDER BY city")]
+
+    def apply_retention(self, now=None):
+        """Drop expired rows and downsample older observations to hourly means"""
+        now = int(time.time()) if now is None else int(now)
+        observation_cutoff = now - self.retention_days * 86400
+        snapshot_cutoff = now - self.snapshot_retention_days * 86400
+        downsample_cutoff = (now - self.downsample_after_days * 86400) // 3600 * 3600
+        averages = ', '.join(f"AVG({column})" for column in OBSERVATION_COLUMNS)
+        
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM observations WHERE dt < ?", (observation_cutoff,))
+            self._conn.execute("DELETE FROM forecast_snapshots WHERE issued_at < ?", (snapshot_cutoff,))
+            
+            # Only hours holding more than one sample need collapsing
+            hourly = self._conn.execute(
+                f"SELECT city, dt / 3600 * 3600 AS hour, {averages}, MAX(description) FROM observations "
+                "WHERE dt < ? GROUP BY city, hour HAVING COUNT(*) > 1", (downsample_cutoff,)).fetchall()
+            for row in hourly:
+                self._conn.execute("DELETE FROM observations WHERE city = ? AND dt >= ? AND dt < ?",
+                                   (row[0], row[1], row[1] + 3600))
+            self._conn.executemany("INSERT INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", hourly)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def describe_status(status, city):
+    """User-facing message for a failed /weather request"""
+    if status == 401:
+        return "API key invalid or missing"
+    if status == 429:
+        return "API rate limit exceeded"
+    if status is not None and status >= 500:
+        return f"Weather service error (HTTP {status})"
+    return f"City not found: {city}"
+
+
+def onecall_entry(item, temp_min=None, temp_max=None):
+    """Convert a One Call current/hourly/daily item into the 2.5 forecast entry shape"""
+    temp = item['temp']['day'] if isinstance(item['temp'], dict) else item['temp']
+    feels_like = item['feels_like']['day'] if isinstance(item['feels_like'], dict) else item['feels_like']
+    return {
+        'dt': item['dt'],
+        'main': {
+            'temp': temp,
+            'feels_like': feels_like,
+            'temp_min': temp if temp_min is None else temp_min,
+            'temp_max': temp if temp_max is None else temp_max,
+            'humidity': item['humidity'],
+            'pressure': item['pressure']
+        },
+        'wind': {'speed': item['wind_speed'], 'deg': item.get('wind_deg', 0)},
+        'weather': item['weather']
+    }
+
+
+# Paths inside one forecast entry -> column, for the 2.5 list and the One Call hourly/daily arrays
+FORECAST_PATHS = {
+    'dt': 'dt',
+    'main.temp': 'temp',
+    'main.temp_min': 'temp_min',
+    'main.temp_max': 'temp_max',
+    'main.humidity': 'humidity',
+    'main.pressure': 'pressure',
+    'wind.speed': 'wind_speed',
+    'wind.deg': 'wind_deg',
+    'weather.item.description': 'description',
+    'weather.item.icon': 'icon'
+}
+
+ONECALL_PATHS = {
+    'dt': 'dt',
+    'temp': 'temp',
+    'temp.day': 'temp',
+    'temp.min': 'temp_min',
+    'temp.max': 'temp_max',
+    'humidity': 'humidity',
+    'pressure': 'pressure',
+    'wind_speed': 'wind_speed',
+    'wind_deg': 'wind_deg',
+    'weather.item.description': 'description',
+    'weather.item.icon': 'icon'
+}
+
+
+class ForecastColumns:
+    """Accumulate forecast entries into typed arrays as they stream in, without keeping the raw dicts"""
+
+    __slots__ = ('dt', 'values', 'description', 'icon', 'row', '_strings')
+
+    def __init__(self):
+        self.dt = array('q')
+        self.values = {field: array('d') for field in FORECAST_FIELDS}
+        self.description = []
+        self.icon = []
+        self.row = None
+        # Descriptions and icon codes repeat a lot; share one string per distinct value
+        self._strings = {}
+
+    def start(self):
+        self.row = {}
+
+    def set(self, field, value):
+        # The first value wins, e.g. the primary weather condition
+        self.row.setdefault(field, value)
+
+    def end(self):
+        row = self.row
+        self.row = None
+        self.dt.append(int(row.get('dt', 0)))
+        temp = row.get('temp', 0)
+        for field, values in self.values.items():
+            # One Call hourly entries have no min/max; use the temperature like onecall_entry does
+            default = temp if field in ('temp_min', 'temp_max') else 0
+            values.append(float(row.get(field, default)))
+        description = str(row.get('description', '')).title()
+        self.description.append(self._strings.setdefault(description, description))
+        icon = str(row.get('icon', ''))
+        self.icon.append(self._strings.setdefault(icon, icon))
+
+    def finish(self):
+        """Columnar dict in the same shape parse_forecast returns"""
+        forecast = {'dt': np.frombuffer(self.dt, dtype=np.int64).copy()}
+        for field, values in self.values.items():
+            forecast[field] = np.frombuffer(values, dtype=np.float64).copy()
+        forecast['description'] = np.array(self.description, dtype=object)
+        forecast['icon'] = np.array(self.icon, dtype=object)
+        return add_local_time(forecast)
+
+
+def stream_columns(fp, tables, meta_prefix):
+    """Walk a JSON body once, filling ForecastColumns per array and collecting scalars under meta_prefix
+
+    tables maps an array item prefix such as 'list.item' to (ForecastColumns, paths).
+    """
+    meta = {}
+    active = None
+    for prefix, event, value in ijson.parse(fp, use_float=True):
+        if active is not None:
+            item_prefix, columns, paths = active
+            if event == 'end_map' and prefix == item_prefix:
+                columns.end()
+                active = None
+            elif event in ('number', 'string'):
+                field = paths.get(prefix[len(item_prefix) + 1:])
+                if field:
+                    columns.set(field, value)
+        elif event == 'start_map' and prefix in tables:
+            active = (prefix, *tables[prefix])
+            active[1].start()
+        elif event in ('number', 'string') and prefix.startswith(meta_prefix):
+            meta.setdefault(prefix[len(meta_prefix):], value)
+    return meta
+
+
+def read_forecast(fp, stream=True):
+    """Read a 2.5 /forecast body into {'city', 'forecast', 'daily'}, streamed if asked and ijson is installed"""
+    if not stream or ijson is None:
+        data = json.load(fp)
+        return {'city': {'name': data['city']['name'], 'country': data['city'].get('country', '')},
+                'forecast': parse_forecast(data['list']), 'daily': None}
+    
+    hourly = ForecastColumns()
+    meta = stream_columns(fp, {'list.item': (hourly, FORECAST_PATHS)}, 'city.')
+    return {'city': {'name': meta.get('name', ''), 'country': meta.get('country', '')},
+            'forecast': hourly.finish(), 'daily': None}
+
+
+def read_onecall(fp, stream=True):
+    """Read a One Call body into {'current', 'forecast', 'daily'}, streamed if asked and ijson is installed"""
+    if not stream or ijson is None:
+        data = json.load(fp)
+        return {
+            'current': onecall_entry(data['current']),
+            'forecast': parse_forecast([onecall_entry(item) for item in data.get('hourly', [])]),
+            'daily': parse_forecast([onecall_entry(item, item['temp']['min'], item['temp']['max'])
+                                     for item in data.get('daily', [])])
+        }
+    
+    hourly = ForecastColumns()
+    daily = ForecastColumns()
+    meta = stream_columns(fp, {'hourly.item': (hourly, ONECALL_PATHS), 'daily.item': (daily, ONECALL_PATHS)},
+                          'current.')
+    weather = {key[len('weather.item.'):]: value for key, value in meta.items() if key.startswith('weather.item.')}
+    current = {key: value for key, value in meta.items() if '.' not in key}
+    current['weather'] = [weather]
+    return {'current': onecall_entry(current), 'forecast': hourly.finish(), 'daily': daily.finish()}
+
+
+def select_daily(bundle):
+    """Daily series for the cards: One Call's daily data when present, otherwise the forecast itself"""
+    if bundle.get('daily') is not None and bundle['daily']['dt'].size:
+        return bundle['daily']
+    return bundle['forecast']
+
+
+class OpenWeather25Provider:
+    """Current weather and 3-hourly forecast from the 2.5 /weather and /forecast endpoints"""
+
+    name = '2.5'
+    endpoints = ('weather', 'forecast')
+    # Large bodies are streamed into columns; /weather is small enough to decode whole
+    readers = {'forecast': read_forecast}
+
+    def __init__(self, client):
+        self.client = client
+
+    def fetch(self, city):
+        futures = {
+            self.client.executor.submit(self.client.request_endpoint, endpoint, city,
+                                        self.readers.get(endpoint)): endpoint
+            for endpoint in self.endpoints
+        }
+        for future in as_completed(futures):
+            status, data = future.result()
+            yield futures[future], status, data
+
+
+class OneCallProvider:
+    """Current, 48h hourly and daily data in a single One Call 3.0 request by coordinates"""
+
+    name = 'onecall'
+    endpoints = ('onecall',)
+
+    def __init__(self, client):
+        self.client = client
+
+    def geocode(self, city):
+        """Resolve a city name to coordinates, cached locally for a month"""
+        url = f"{self.client.api_root}/geo/1.0/direct?q={city}&limit=1&appid={self.client.api_key}"
+        status, results = self.client.request('geocode', city, url)
+        if status != 200:
+            return status, None
+        if not results:
+            return 404, None
+        return 200, results[0]
+
+    def fetch(self, city):
+        status, place = self.geocode(city)
+        if status != 200:
+            yield 'weather', status, None
+            yield 'forecast', status, None
+            return
+        
+        url = (f"{self.client.api_root}/data/3.0/onecall?lat={place['lat']}&lon={place['lon']}"
+               f"&exclude=minutely,alerts&appid={self.client.api_key}&units=metric")
+        status, data = self.client.request('onecall', city, url, read_onecall)
+        if status != 200:
+            yield 'weather', status, None
+            yield 'forecast', status, None
+            return
+        
+        # Normalise into the 2.5 shapes the rest of the app already understands
+        current = dict(data['current'], name=place['name'], sys={'country': place.get('country', '')},
+                       coord={'lat': place['lat'], 'lon': place['lon']})
+        yield 'weather', 200, current
+        yield 'forecast', 200, {
+            'city': {'name': place['name'], 'country': place.get('country', '')},
+            'forecast': data['forecast'],
+            'daily': data['daily']
+        }
+
+
+class FallbackProvider:
+    """Use the primary provider until it refuses the API key, then the secondary one"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.primary_enabled = True
+
+    @property
+    def name(self):
+        return self.primary.name if self.primary_enabled else self.fallback.name
+
+    @property
+    def endpoints(self):
+        return self.primary.endpoints if self.primary_enabled else self.fallback.endpoints
+
+    def fetch(self, city):
+        if self.primary_enabled:
+            results = list(self.primary.fetch(city))
+            # One Call needs its own subscription; only an auth failure means trying the 2.5 API.
+            # Anything else (unknown city, 429, 5xx) is reported as is, so the caller backs off
+            # instead of spending more calls on the fallback
+            if not any(result[1] in (401, 403) for result in results):
+                yield from results
+                return
+            self.primary_enabled = False
+        yield from self.fallback.fetch(city)
+
+
+PROVIDERS = ('auto', 'onecall', '2.5')
+
+
+class WeatherClient:
+    """OpenWeatherMap client with a response cache, pooled session and rate limiting"""
+
+    # Forecast bodies at least this long (about 75 days of 3-hourly data) are streamed into columns
+    STREAM_MIN_BYTES = 256 * 1024
+
+    def __init__(self, api_key="", cache_dir=None, calls_per_minute=60, max_workers=4, base_url=None,
+                 provider='auto'):
+        self.api_key = api_key
+        # OPENWEATHER_BASE_URL points the client at a stand-in server such as benchmarks/mock_server.py
+        self.base_url = base_url or os.environ.get('OPENWEATHER_BASE_URL', API_BASE_URL)
+        self.api_root = self.base_url.rsplit('/data/', 1)[0]
+        # Stand-in servers serve the icons next to the API
+        self.icon_url = ICON_URL if self.base_url == API_BASE_URL else f"{self.api_root}/img/wn/{{code}}@2x.png"
+        self.cache = ResponseCache(cache_dir=cache_dir)
+        self.session = create_http_session()
+        self.rate_limiter = RateLimiter(calls_per_minute=calls_per_minute)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='weather-request')
+        self.provider = self.create_provider(provider)
+
+    def create_provider(self, name):
+        if name == '2.5':
+            return OpenWeather25Provider(self)
+        if name == 'onecall':
+            return OneCallProvider(self)
+        if name == 'auto':
+            return FallbackProvider(OneCallProvider(self), OpenWeather25Provider(self))
+        raise ValueError(f"Unknown provider {name!r}, expected one of {', '.join(PROVIDERS)}")
+
+    def request_endpoint(self, endpoint, city, reader=None):
+        """Return (status_code, data) for a 2.5 endpoint, served from the cache while fresh"""
+        url = f"{self.base_url}/{endpoint}?q={city}&appid={self.api_key}&units=metric"
+        return self.request(endpoint, city, url, reader)
+
+    def request(self, endpoint, key, url, reader=None):
+        """Return (status_code, data) for a URL cached under (endpoint, key)
+
+        With a reader the body is handed to it instead of being decoded with
+        response.json(), streamed when should_stream says so, and whatever it
+        returns is cached.
+        """
+        entry, fresh = self.cache.lookup(endpoint, key)
+        if fresh:
+            return 200, entry['data']
+        
+        # Revalidate stale entries with a conditional request
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        
+        self.rate_limiter.acquire()
+        with metrics.span(f'network.{endpoint}'):
+            response = self.session.get(url, headers=headers, timeout=10, stream=reader is not None)
+        
+        with response:
+            if response.status_code == 304 and entry:
+                self.cache.touch(endpoint, key)
+                return 200, entry['data']
+            if response.status_code == 200:
+                # A streamed body is read while decoding, so this span includes the transfer
+                with metrics.span(f'decode.{endpoint}'):
+                    if reader:
+                        response.raw.decode_content = True
+                        data = reader(response.raw, stream=self.should_stream(response))
+                    else:
+                        data = response.json()
+                self.cache.store(endpoint, key, data, response.headers)
+                return 200, data
+            return response.status_code, None
+
+    def should_stream(self, response):
+        """Stream a body only when it is large or of unknown length
+
+        Below STREAM_MIN_BYTES json is faster and has a lower peak than the
+        ijson event loop (see bench_ingest); the 5-day forecast and One Call's
+        48 hours are well under it.
+        """
+        length = response.headers.get('Content-Length', '')
+        return not length.isdigit() or int(length) >= self.STREAM_MIN_BYTES
+
+    def fetch(self, city):
+        """Yield ('weather', status, json) and ('forecast', status, {'city', 'forecast', 'daily'}) as they arrive"""
+        yield from self.provider.fetch(city)
+
+    def icon_asset_name(self, code):
+        """File name for a cached icon, tagged with the icon URL so icons from different servers never mix"""
+        digest = hashlib.sha1(self.icon_url.encode('utf-8')).hexdigest()[:12]
+        return f"icon_{code}_{digest}.png"
+
+    def fetch_icon(self, code):
+        """PNG bytes of a condition icon such as '10d', or None when it is not available"""
+        with metrics.span('network.icon'):
+            response = self.session.get(self.icon_url.format(code=code), timeout=10)
+        with response:
+            return response.content if response.status_code == 200 else None
+
+    def expires_at(self, city):
+        """When the cached current conditions for a city go stale"""
+        return self.cache.expires_at(self.provider.endpoints[0], city)
+
+    def fetch_city_summary(self, city):
+        """Fetch and parse one city into current conditions, daily summaries and forecast columns"""
+        summary = {'current': None, 'daily': [], 'forecast': None, 'error': None}
+        
+        for endpoint, status, data in self.fetch(city):
+            if endpoint == 'weather':
+                if status != 200:
+                    summary['error'] = describe_status(status, city)
+                else:
+                    summary['current'] = parse_current_weather(data)
+            elif status == 200:
+                summary['daily'] = summarize_daily_forecast(select_daily(data))
+                summary['forecast'] = data['forecast']
+        return summary
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
@@ -0,0 +1,287 @@
+"""Local HTTP/JSON server sharing one weather cache between many clients.
+
+Serves current conditions, daily summaries and PNG chart renders from a
+single WeatherClient, so dashboards, scripts and browsers on the same host or
+network reuse one set of upstream calls:
+
+    python weather.py serve --port 8080
+    curl "http://127.0.0.1:8080/current?city=London"
+    curl "http://127.0.0.1:8080/daily?city=London&days=5"
+    curl -o london.png "http://127.0.0.1:8080/chart.png?city=London&kind=wind"
+
+Built on asyncio streams from the standard library. Fetching, parsing and
+rendering are blocking, so they run in thread pools; concurrent requests for
+the same city (or the same chart) share one in-flight job instead of each
+starting their own.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from weather_charts import FORECAST_CHARTS, render_chart_png
+from weather_core import (
+    daily_to_json, describe_status, metrics, parse_current_weather, select_daily, summarize_daily_forecast
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    """An error response: status code plus a message sent back as JSON"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class WeatherServer:
+    """asyncio HTTP front end over one shared WeatherClient"""
+
+    # Upstream failures are reported to clients as these statuses
+    UPSTREAM_STATUS = {404: 404, 429: 503}
+    # Longest request line or header line (asyncio's default stream limit) and most header lines
+    MAX_LINE = 64 * 1024
+    MAX_HEADERS = 100
+
+    def __init__(self, client, host='127.0.0.1', port=8080, max_workers=8, max_charts=64,
+                 idle_timeout=30):
+        self.client = client
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='weather-serve')
+        # Agg figures are created and drawn on one thread, like the dashboard's renderer
+        self.render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='weather-serve-render')
+        self.max_charts = max_charts
+        # (city, kind, width, height) -> (forecast the PNG was drawn from, PNG bytes)
+        self.charts = OrderedDict()
+        self.inflight = {}
+        self.stats = {'requests': 0, 'fetches': 0, 'renders': 0, 'coalesced': 0}
+        self.routes = {
+            '/current': self.handle_current,
+            '/daily': self.handle_daily,
+            '/chart.png': self.handle_chart,
+            '/health': self.handle_health,
+            '/metrics': self.handle_metrics
+        }
+        self.server = None
+
+    async def coalesce(self, key, executor, func, *args):
+        """Run func in executor, sharing the result with every caller that asks for the same key meanwhile"""
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.stats['coalesced'] += 1
+        # A client hanging up must not cancel the job the others are waiting on
+        return await asyncio.shield(future)
+
+    def fetch_city(self, city):
+        """Blocking fetch through the shared client; fresh cache entries make this cheap"""
+        self.stats['fetches'] += 1
+        with metrics.span('serve.fetch'):
+            return {endpoint: (status, data) for endpoint, status, data in self.client.fetch(city)}
+
+    async def fetch(self, city, endpoint):
+        """Data of one endpoint ('weather' or 'forecast') for a city, or an HTTPError"""
+        try:
+            results = await self.coalesce(('fetch', city.lower()), self.executor, self.fetch_city, city)
+        except requests.exceptions.RequestException as e:
+            raise HTTPError(502, f"Network error: {str(e)}")
+        status, data = results[endpoint]
+        if status != 200:
+            headers = {'Retry-After': '60'} if status == 429 else None
+            raise HTTPError(self.UPSTREAM_STATUS.get(status, 502), describe_status(status, city), headers)
+        return data
+
+    def cache_headers(self, city):
+        expires_at = self.client.expires_at(city)
+        max_age = max(0, int(expires_at - time.time())) if expires_at else 0
+        return {'Cache-Control': f'max-age={max_age}'}
+
+    @staticmethod
+    def city_param(params):
+        city = params.get('city', [''])[0].strip()
+        if not city:
+            raise HTTPError(400, "Missing 'city' parameter")
+        return city
+
+    @staticmethod
+    def int_param(params, name, default, low, high):
+        try:
+            return min(max(int(params.get(name, [default])[0]), low), high)
+        except ValueError:
+            raise HTTPError(400, f"'{name}' must be an integer")
+
+    async def handle_current(self, params):
+        city = self.city_param(params)
+        data = await self.fetch(city, 'weather')
+        return 200, 'application/json', parse_current_weather(data), self.cache_headers(city)
+
+    async def handle_daily(self, params):
+        city = self.city_param(params)
+        days = self.int_param(params, 'days', 5, 1, 16)
+        data = await self.fetch(city, 'forecast')
+        daily = daily_to_json(summarize_daily_forecast(select_daily(data), days=days))
+        return 200, 'application/json', daily, self.cache_headers(city)
+
+    async def handle_chart(self, params):
+        city = self.city_param(params)
+        kind = params.get('kind', ['temperature'])[0]
+        if kind not in FORECAST_CHARTS:
+            raise HTTPError(400, f"Unknown chart {kind!r}, expected one of {', '.join(FORECAST_CHARTS)}")
+        width = self.int_param(params, 'width', 1000, 200, 2000)
+        height = self.int_param(params, 'height', 400, 150, 1200)
+        data = await self.fetch(city, 'forecast')
+        forecast = data['forecast']
+        if forecast['dt'].size == 0:
+            raise HTTPError(502, "Error fetching forecast data")
+
+        # A PNG stays valid until the cache hands out a newer forecast object
+        key = (city.lower(), kind, width, height)
+        cached = self.charts.get(key)
+        if cached is None or cached[0] is not forecast:
+            png = await self.coalesce(('chart',) + key + (id(forecast),), self.render_executor, self.render,
+                                      kind, forecast, data['city']['name'], width, height)
+            self.charts[key] = cached = (forecast, png)
+            while len(self.charts) > self.max_charts:
+                self.charts.popitem(last=False)
+        self.charts.move_to_end(key)
+        return 200, 'image/png', cached[1], self.cache_headers(city)
+
+    def render(self, kind, forecast, city, width, height):
+        self.stats['renders'] += 1
+        with metrics.span(f'serve.render.{kind}'):
+            return render_chart_png(kind, forecast, city, width, height)
+
+    async def handle_health(self, params):
+        return 200, 'application/json', dict(self.stats, status='ok', provider=self.client.provider.name,
+                                             charts=len(self.charts)), {}
+
+    async def handle_metrics(self, params):
+        return 200, 'text/plain; version=0.0.4', metrics.to_prometheus(), {}
+
+    async def dispatch(self, method, target):
+        """Return (status, content type, body, extra headers) for one request"""
+        url = urlsplit(target)
+        handler = self.routes.get(url.path.rstrip('/') or '/')
+        try:
+            if handler is None:
+                raise HTTPError(404, f"Unknown path {url.path}; try {', '.join(self.routes)}")
+            if method != 'GET':
+                raise HTTPError(405, "Only GET is supported", {'Allow': 'GET'})
+            with metrics.span(f'serve.{url.path.strip("/").split(".")[0]}'):
+                return await handler(parse_qs(url.query))
+        except HTTPError as e:
+            return e.status, 'application/json', {'error': str(e)}, e.headers
+        except Exception as e:
+            logger.exception("Error serving %s", target)
+            return 500, 'application/json', {'error': f"Error: {str(e)}"}, {}
+
+    async def read_line(self, reader):
+        try:
+            return await asyncio.wait_for(reader.readline(), self.idle_timeout)
+        except (ValueError, asyncio.LimitOverrunError):
+            # readline raises ValueError once a line exceeds the stream limit
+            raise HTTPError(431, "Request line or header too long")
+
+    async def read_request(self, reader):
+        """Request line and headers, or None once the client has gone"""
+        line = await self.read_line(reader)
+        if not line:
+            return None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for count in range(self.MAX_HEADERS + 1):
+            line = await self.read_line(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if count == self.MAX_HEADERS:
+                raise HTTPError(431, "Too many header lines")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return parts, headers
+
+    @staticmethod
+    def can_keep_alive(request):
+        """Whether the connection may carry another request after this one
+
+        Request bodies are never read, so any request that might have one
+        closes the connection instead of leaving its bytes to be parsed as
+        the next request line.
+        """
+        (method, target, version), headers = request
+        has_body = headers.get('content-length', '0').strip() != '0' or 'transfer-encoding' in headers
+        return (method == 'GET' and not has_body and version == 'HTTP/1.1'
+                and headers.get('connection', '').lower() != 'close')
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection; HTTP/1.1 connections are kept alive between them"""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HTTPError as e:
+                    request, response = None, (e.status, 'application/json', {'error': str(e)}, {})
+                else:
+                    if request is None:
+                        break
+                    (method, target, version), headers = request
+                    self.stats['requests'] += 1
+                    response = await self.dispatch(method, target)
+
+                keep_alive = request is not None and self.can_keep_alive(request)
+                self.write_response(writer, *response, keep_alive=keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def write_response(writer, status, content_type, body, headers, keep_alive):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        elif not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        if content_type.startswith(('application/json', 'text/')) and 'charset' not in content_type:
+            content_type += '; charset=utf-8'
+        lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}',
+                 f'Content-Type: {content_type}',
+                 f'Content-Length: {len(body)}',
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                 limit=self.MAX_LINE)
+        # Port 0 picks a free port; report the real one
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=False)
+        self.render_executor.shutdown(wait=False)